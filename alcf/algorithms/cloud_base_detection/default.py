@@ -7,31 +7,17 @@ from alcf import misc
 def cloud_base_detection(d, **options):
 	cloud_mask = d['cloud_mask']
 	if len(cloud_mask.shape) == 3:
-		n, m, l = d['cloud_mask'].shape
-		dims = (n,l)
 		dimnames = ('time', 'column')
 	else:
-		n, m = d['cloud_mask'].shape
-		l = 1
-		dims = (n,)
 		dimnames = ('time',)
-	cbh = np.zeros(dims, dtype=np.float64)
-	for i in range(n):
-		for j in range(l):
-			x = cloud_mask[i,:,j] if len(dims) == 2 \
-				else cloud_mask[i,:]
-			kk = np.where(x == 1)[0]
-			if np.any(np.isnan(x)):
-				v = np.nan
-			elif len(kk) > 0:
-				v = d['zfull'][kk[0]]
-			else:
-				v = np.inf
-			if len(dims) == 2:
-				cbh[i,j] = v
-			else:
-				cbh[i] = v
-	d['cbh'] = cbh
+	# Index of the first cloudy level along the level axis. Profiles
+	# without a cloud have a cloud base height of infinity and profiles with
+	# a missing value in the cloud mask have an undefined cloud base height.
+	cloud = cloud_mask == 1
+	k = np.argmax(cloud, axis=1)
+	cbh = np.where(np.any(cloud, axis=1), d['zfull'][k], np.inf)
+	cbh[np.any(np.isnan(cloud_mask), axis=1)] = np.nan
+	d['cbh'] = cbh.astype(np.float64, copy=False)
 	d['.']['cbh'] = {
 		'.dims': dimnames,
 		'long_name': 'cloud base height',
@@ -3,8 +3,6 @@
 import sys
 import ds_format as ds
 import numpy as np
-from scipy.stats import norm
-from scipy.optimize import minimize_scalar
 from alcf import misc
 
 def cloud_detection(d,
@@ -16,45 +14,37 @@ def cloud_detection(d,
 	**options
 ):
 	b = d['backscatter']
-	if b.ndim == 3:
-		n, m, l = b.shape
-	else:
-		n, m = b.shape
+	zfull = d['zfull']
+
+	def expand(x):
+		# Broadcast a (time, level) or (level,) array to the shape of
+		# backscatter.
+		if zfull.ndim == 1 and x.ndim == 1:
+			x = x[np.newaxis,:]
+		return x[:,:,np.newaxis] if b.ndim == 3 else x
 
 	if bsd is None:
 		bsd2 = d.get('backscatter_sd')
 	else:
-		bsd2 = np.full(b.shape, bsd, np.float64)
-		f = (d['zfull']/bsd_z)**2
-		if b.ndim == 3:
-			for i in range(b.shape[2]):
-				bsd2[:,:,i] *= f
-		else:
-			bsd2 *= f
+		bsd2 = expand(bsd*(zfull/bsd_z)**2)
 	bmol = d.get('backscatter_mol')
-	x = np.copy(b)
+	x = b
 	if bsd2 is not None:
-		x -= cloud_nsd*bsd2
+		x = b - cloud_nsd*bsd2
 	if bmol is not None:
-		if len(x.shape) == 3:
-			for i in range(x.shape[2]):
-				x[:,:,i] -= bmol
+		if x is b:
+			x = b - expand(bmol)
 		else:
-			x -= bmol
+			x -= expand(bmol)
 
 	cloud_mask = np.full(x.shape, np.nan, np.float64)
 	if cloud_threshold_exp is not None:
 		ct_x, ct_y, ct_h = cloud_threshold_exp
-		for i in range(n):
-			alt = 0 if np.isnan(d['altitude'][i]) else d['altitude'][i]
-			height = d['zfull'] - alt
-			height[height < 0] = 0
-			ct = ct_y + (ct_x - ct_y)*0.5**(height/ct_h)
-			if x.ndim == 3:
-				for k in range(l):
-					cloud_mask[i,:,k] = x[i,:,k] >= ct
-			else:
-				cloud_mask[i,:] = x[i,:] >= ct
+		alt = np.ma.filled(np.ma.asarray(d['altitude'], np.float64), np.nan)
+		alt = np.where(np.isnan(alt), 0, alt)
+		height = np.maximum(zfull - alt[:,np.newaxis], 0)
+		ct = ct_y + (ct_x - ct_y)*0.5**(height/ct_h)
+		cloud_mask[::] = x >= expand(ct)
 	else:
 		cloud_mask[::] = x >= cloud_threshold
 		cloud_mask[np.isnan(x)] = np.nan
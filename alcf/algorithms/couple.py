@@ -34,37 +34,40 @@ def couple(d, d_idx, interp=None):
 			'long_name': 'total_attenuated_molecular_backscatter_coefficient',
 			'units': 'm-1 sr-1',
 		}
+	dd1 = []
 	for i in range(n):
 		t = d['time'][i]
 		j = np.argmin(np.abs(d_idx['time'] - t))
 		n1 = d_idx['n'][j]
 		filename = d_idx['filename'][n1]
 		i1 = d_idx['i'][j]
-		d1 = ds.read(filename, VARIABLES, {'time': i1})
-		zhalf1 = misc.half(d1['zfull'])
-		zhalf = misc.half(d['zfull'][i,:]) \
-			if d['zfull'].ndim == 2 \
-			else misc.half(d['zfull'])
-		if couple_bsd and 'backscatter_sd' in d1:
-			b_sd = algorithms.interp(
+		dd1 += [ds.read(filename, VARIABLES, {'time': i1})]
+	zfull = np.broadcast_to(d['zfull'], (n, d['zfull'].shape[-1]))
+	zhalf = misc.half(zfull)
+	for var, couple_var in [
+		('backscatter_sd', couple_bsd),
+		('backscatter_mol', couple_bmol),
+	]:
+		if not couple_var:
+			continue
+		# Profiles are interpolated in batches of the same number of levels.
+		groups = {}
+		for i, d1 in enumerate(dd1):
+			if var in d1:
+				groups.setdefault(len(d1['zfull']), []).append(i)
+		for ii in groups.values():
+			zfull1 = np.array([dd1[i]['zfull'] for i in ii])
+			x1 = np.array([dd1[i][var] for i in ii])
+			x = algorithms.interp_batch(
 				interp,
-				d1['zfull'], zhalf1,
-				d1['backscatter_sd'],
-				d['zfull'][i,:], zhalf
+				zfull1, misc.half(zfull1),
+				x1[:,:,np.newaxis],
+				zfull[ii], zhalf[ii]
 			)
-			if len(dims) == 3:
-				for k in range(l):
-					d['backscatter_sd'][i,:,k] = b_sd
+			if var == 'backscatter_sd' and len(dims) == 3:
+				d[var][ii] = x
 			else:
-				d['backscatter_sd'][i,:] = b_sd
-		if couple_bmol and 'backscatter_mol' in d1:
-			b_mol = algorithms.interp(
-				interp,
-				d1['zfull'], zhalf1,
-				d1['backscatter_mol'],
-				d['zfull'][i,:], zhalf
-			)
-			d['backscatter_mol'][i,:] = b_mol
+				d[var][ii] = x[:,:,0]
 
 def stream(dd, state, dirname, interp=None):
 	if 'd_idx' not in state:
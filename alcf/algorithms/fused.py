@@ -0,0 +1,246 @@
+import numpy as np
+import ds_format as ds
+from alcf import misc, algorithms
+from alcf.algorithms import zsample, tsample as tsample_mod
+from alcf.algorithms.noise_removal.default import scaling
+from alcf.algorithms.cloud_detection.default import cloud_detection
+from alcf.algorithms.cloud_base_detection.default import \
+	cloud_base_detection
+
+# Fused processing of lidar data with the default noise removal,
+# calibration, cloud detection and cloud base detection algorithms. It is
+# equivalent to the separate stages up to floating point rounding, but the
+# backscatter is only read once per time sampling period: the profiles are
+# averaged first and the average profile is then noise-corrected,
+# calibrated and resampled in height, which is possible because these
+# operations are linear. As in tsample, cells for which the average is not
+# finite are masked. Periods with non-finite or masked input values are
+# processed profile by profile with the separate stages, because tsample
+# masks a cell if any profile is not finite in it after height resampling,
+# which is not reproduced by averaging before height resampling. Cloud
+# detection, cloud base detection and the lidar ratio are calculated in one
+# step for the output period.
+
+CALIBRATED_VARS = ['backscatter', 'backscatter_mol', 'backscatter_sd']
+
+def noise(d, **options):
+	# Noise mean and standard deviation of the noise removal period,
+	# calculated as in the default noise removal, stored for every profile.
+	bt = d['backscatter'][:,-1]
+	n = len(bt)
+	w = d['time_bnds'][:,1] - d['time_bnds'][:,0]
+	noise_m = np.ma.getdata(np.average(bt, weights=w))
+	noise_sd = np.sqrt(np.cov(bt, aweights=w)) if n > 1 else 0.
+	d['noise_m'] = np.full(n, noise_m, np.float64)
+	d['noise_sd'] = np.full(n, noise_sd, np.float64)
+	d['.']['noise_m'] = {'.dims': ['time']}
+	d['.']['noise_sd'] = {'.dims': ['time']}
+
+def profiles(d, var, n, m):
+	# Variable var as an array of shape (time, level, rest).
+	dims = ds.dims(d, var)
+	x = np.ma.getdata(d[var])
+	x = np.moveaxis(x, [dims.index('time'), dims.index('level')], [0, 1])
+	return x.reshape(n, m, -1)
+
+def is_finite(d, vars_):
+	# Check that variables vars_ contain no masked or non-finite values.
+	for var in vars_:
+		x = d[var]
+		if np.ma.is_masked(x) or not np.all(np.isfinite(np.ma.getdata(x))):
+			return False
+	return True
+
+def tsample_profiles(d, tres, noise_m, noise_sd,
+	zres=None,
+	zlim=None,
+	interp=None,
+	calibration_coeff=None,
+	near_noise=[0, 0],
+	**options
+):
+	# Noise correction, calibration, height resampling and time resampling
+	# of one time sampling period profile by profile, as in the separate
+	# stages.
+	if noise_m is not None:
+		b = d['backscatter']
+		zfull = np.ma.getdata(d['zfull'])
+		c, nn = scaling(zfull, near_noise)
+		if zfull.ndim == 1:
+			c = c[np.newaxis,:]
+			nn = nn[np.newaxis,:] if nn is not None else None
+		d['backscatter'] = np.ma.getdata(b - noise_m[:,np.newaxis]*c) \
+			.astype(b.dtype, copy=False)
+		d['backscatter_sd'] = np.broadcast_to(noise_sd[:,np.newaxis]*c,
+			b.shape).astype(b.dtype)
+		if nn is not None:
+			d['backscatter_sd'] += nn
+	if calibration_coeff is not None:
+		for var in CALIBRATED_VARS:
+			if var in d:
+				d[var] = d[var]*calibration_coeff
+	zsample.zsample(d, zres=zres, zlim=zlim, interp=interp)
+	# The input of tsample is aggregated into masked arrays.
+	for var in ds.vars(d):
+		if 'time' in ds.dims(d, var):
+			d[var] = np.ma.asarray(d[var])
+	tsample_mod.tsample(d, tres)
+
+def tsample(d, tres,
+	zres=None,
+	zlim=None,
+	interp=None,
+	calibration_coeff=None,
+	near_noise=[0, 0],
+	**options
+):
+	# Noise correction, calibration, height resampling and time resampling
+	# of one time sampling period.
+	n = ds.dim(d, 'time')
+	m = ds.dim(d, 'level')
+	w = d['time_bnds'][:,1] - d['time_bnds'][:,0]
+	zfull = np.ma.getdata(d['zfull'])
+	zhalf2 = np.arange(zlim[0], zlim[-1] + zres, zres, np.float64)
+	zfull2 = (zhalf2[1:] + zhalf2[:-1])*0.5
+	m2 = len(zfull2)
+	has_noise = 'noise_m' in d
+	noise_m = d.pop('noise_m', None)
+	noise_sd = d.pop('noise_sd', None)
+	d['.'].pop('noise_m', None)
+	d['.'].pop('noise_sd', None)
+	const = zfull.ndim == 1 or np.all(zfull == zfull[0])
+	z = zfull.reshape(-1, m)[[0]] if const else zfull
+
+	level_vars = [var for var in ds.vars(d)
+		if var != 'zfull' and 'level' in ds.dims(d, var)]
+	if not is_finite(d, level_vars):
+		if has_noise:
+			d['.']['backscatter_sd'] = {
+				'.dims': ['time', 'level'],
+				'long_name': 'total attenuated volume backscattering coefficient standard deviation',
+				'units': 'm-1 sr-1',
+			}
+		return tsample_profiles(d, tres, noise_m, noise_sd,
+			zres=zres,
+			zlim=zlim,
+			interp=interp,
+			calibration_coeff=calibration_coeff,
+			near_noise=near_noise,
+		)
+
+	def average(x):
+		return np.tensordot(w, x, axes=(0, 0))[np.newaxis]/np.sum(w)
+
+	# Per-profile quantities are averaged before height resampling if the
+	# profiles have the same heights.
+	agg = average if const else (lambda x: x)
+
+	if has_noise:
+		if 'backscatter_sd' not in level_vars:
+			level_vars += ['backscatter_sd']
+		d['.']['backscatter_sd'] = {
+			'.dims': ['time', 'level'],
+			'long_name': 'total attenuated volume backscattering coefficient standard deviation',
+			'units': 'm-1 sr-1',
+		}
+	dtypes = {var: d[var].dtype if var in d else d['backscatter'].dtype
+		for var in level_vars}
+	yy = []
+	for var in level_vars:
+		if has_noise and var == 'backscatter_sd':
+			c, nn = scaling(z, near_noise)
+			sd = noise_sd[:,np.newaxis]
+			y = agg(sd**2)*c**2
+			if nn is not None:
+				y += 2*agg(sd)*c*nn + nn**2
+			y = y[:,:,np.newaxis]
+		else:
+			x = profiles(d, var, n, m)
+			y = agg(x**2 if var == 'backscatter_sd' else x)
+			if has_noise and var == 'backscatter':
+				c, _ = scaling(z, near_noise)
+				y = y - (agg(noise_m[:,np.newaxis])*c)[:,:,np.newaxis]
+		if calibration_coeff is not None and var in CALIBRATED_VARS:
+			y = y*(calibration_coeff**2 if var == 'backscatter_sd' \
+				else calibration_coeff)
+		yy += [y]
+	if len(level_vars) > 0:
+		k = np.cumsum([0] + [y.shape[2] for y in yy])
+		y2 = algorithms.interp_batch(interp, z, misc.half(z),
+			np.concatenate(yy, axis=2), zfull2, zhalf2)
+	for i, var in enumerate(level_vars):
+		y = y2[:,:,k[i]:k[i+1]]
+		if not const and var == 'backscatter_sd':
+			# As in tsample, non-finite values are averaged as zero unless
+			# all profiles are non-finite.
+			y = np.where(np.all(np.isnan(y), axis=0), np.nan,
+				average(np.nan_to_num(y, nan=0.)))
+		elif not const:
+			y = average(y)
+		if var == 'backscatter_sd':
+			y = np.sqrt(1./n*y)
+		dims = d['.'][var]['.dims']
+		rest = [ds.dim(d, dim) for dim in dims if dim not in ('time', 'level')]
+		d[var] = np.moveaxis(y.reshape([1, m2] + rest), [0, 1],
+			[dims.index('time'), dims.index('level')])
+		if dtypes[var] == np.float32:
+			d[var] = d[var].astype(np.float32)
+		d[var] = np.ma.masked_invalid(d[var])
+
+	d['zfull'] = zfull2
+	d['.']['zfull']['.dims'] = ['level']
+
+	time_bnds = d['time_bnds']
+	d['time_bnds'] = np.array([[
+		np.amin(time_bnds[:,0]),
+		np.amax(time_bnds[:,1])
+	]])
+	d['time'] = np.array(np.mean(d['time_bnds'], axis=1))
+	for var in ds.vars(d):
+		if var in ('time', 'time_bnds') or var in level_vars:
+			continue
+		dims = ds.dims(d, var)
+		if 'time' not in dims:
+			continue
+		i = dims.index('time')
+		shape = list(d[var].shape)
+		dtype = d[var].dtype
+		d[var] = np.average(d[var], axis=i, weights=w)
+		shape[i] = 1
+		d[var] = d[var].reshape(shape)
+		if dtype == np.float32:
+			d[var] = d[var].astype(dtype)
+
+def detection(d, **options):
+	# Cloud detection, cloud base detection and lidar ratio of one output
+	# period.
+	cloud_detection(d, **options)
+	cloud_base_detection(d)
+	dz = np.diff(np.concatenate([[0], d['zfull']]))
+	bint = np.tensordot(np.ma.getdata(d['backscatter']), dz, axes=(1, 0))
+	with np.errstate(divide='ignore'):
+		d['lr'] = 1./(2.*bint)
+	d['.']['lr'] = {
+		'.dims': ['time', 'column'] if bint.ndim == 2 else ['time'],
+		'long_name': 'effective lidar ratio',
+		'units': 'sr',
+	}
+
+def stream_noise(dd, state, noise_removal_sampling=300, align=True,
+	**options):
+	state['aggregate_state'] = state.get('aggregate_state', {})
+	dd = misc.aggregate(
+		dd,
+		state['aggregate_state'],
+		noise_removal_sampling/60./60./24.,
+		align=align,
+	)
+	return misc.stream(dd, state, noise, **options)
+
+def stream_tsample(dd, state, tres=None, align=True, **options):
+	state['aggregate_state'] = state.get('aggregate_state', {})
+	dd = misc.aggregate(dd, state['aggregate_state'], tres, align=align)
+	return misc.stream(dd, state, tsample, tres=tres, **options)
+
+def stream_detection(dd, state, **options):
+	return misc.stream(dd, state, detection, **options)
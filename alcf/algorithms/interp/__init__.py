@@ -10,9 +10,52 @@ INTERP = {
 	'linear': linear,
 }
 
-def interp(type_, *args):
+def get_module(type_):
 	try:
-		module = INTERP['default' if type_ is None else type_]
+		return INTERP['default' if type_ is None else type_]
 	except KeyError:
 		raise ValueError('Invalid interpolation method "%s"' % type_)
-	return module.interp(*[np.array(x).astype(np.float64) for x in args])
+
+def check_half(xhalf, name):
+	# The area-weighting kernels assume non-decreasing half levels and do not
+	# check them.
+	with np.errstate(invalid='ignore'):
+		if np.any(np.diff(xhalf, axis=-1) < 0):
+			raise ValueError('%s must be non-decreasing' % name)
+
+def check_shape(x, xhalf, y, x2, xhalf2):
+	# The kernels do not check array bounds, so arrays of inconsistent
+	# lengths would be read out of bounds.
+	if xhalf.shape[-1] != x.shape[-1] + 1:
+		raise ValueError('xhalf must have one more element than x')
+	if y.shape[x.ndim - 1] != x.shape[-1]:
+		raise ValueError('y must have the same number of levels as x')
+	if xhalf2.shape[-1] != x2.shape[-1] + 1:
+		raise ValueError('xhalf2 must have one more element than x2')
+
+def interp(type_, *args):
+	module = get_module(type_)
+	args = [np.array(x).astype(np.float64) for x in args]
+	check_shape(*args)
+	check_half(args[1], 'xhalf')
+	check_half(args[4], 'xhalf2')
+	return module.interp(*args)
+
+def interp_batch(type_, x, xhalf, y, x2, xhalf2):
+	module = get_module(type_)
+	y = np.asarray(y, dtype=np.float64)
+	n = y.shape[0]
+	def profiles(a, name):
+		a = np.asarray(a, dtype=np.float64)
+		if a.ndim > 2 or a.ndim == 2 and a.shape[0] != n:
+			raise ValueError('%s must have the same number of profiles as y' %
+				name)
+		return np.broadcast_to(a, (n, a.shape[-1]))
+	x = profiles(x, 'x')
+	xhalf = profiles(xhalf, 'xhalf')
+	x2 = profiles(x2, 'x2')
+	xhalf2 = profiles(xhalf2, 'xhalf2')
+	check_shape(x, xhalf, y, x2, xhalf2)
+	check_half(xhalf, 'xhalf')
+	check_half(xhalf2, 'xhalf2')
+	return module.interp_batch(x, xhalf, y, x2, xhalf2)
@@ -3,18 +3,22 @@ cimport numpy as np
 import numpy as np
 from libc.math cimport isnan
 
-def interp(
-	np.ndarray[double, ndim=1] x not None,
-	np.ndarray[double, ndim=1] xhalf not None,
-	np.ndarray[double, ndim=1] y not None,
-	np.ndarray[double, ndim=1] x2 not None,
-	np.ndarray[double, ndim=1] xhalf2 not None
-):
-	cdef long n = len(x)
-	cdef long n2 = len(x2)
-	cdef np.ndarray[double, ndim=1] y2 = np.full(n2, np.nan, dtype=np.float64)
-	cdef long i = 0
-	cdef long i2 = 0
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void interp1(
+	const double[:] x,
+	const double[:] xhalf,
+	const double[:] y,
+	const double[:] x2,
+	const double[:] xhalf2,
+	double[:] y2
+) noexcept nogil:
+	cdef Py_ssize_t n = x.shape[0]
+	cdef Py_ssize_t n2 = x2.shape[0]
+	cdef Py_ssize_t i = 0
+	cdef Py_ssize_t i2 = 0
+	cdef double dx = 0
 	cdef double dxa = 0
 	cdef double dxb = 0
 	cdef double dxtot = 0
@@ -29,8 +33,8 @@ def interp(
 	while i < n and xhalf[i+1] < xhalf2[0]:
 		i += 1
 	if i == n:
-		return y2
-	while i2 < n2 and xhalf2[i2] < xhalf[-1]:
+		return
+	while i2 < n2 and xhalf2[i2] < xhalf[n]:
 		dxtot = 0
 		while i < n and xhalf[i] < xhalf2[i2+1]:
 			a = max(xhalf[i], xhalf2[i2])
@@ -42,8 +46,6 @@ def interp(
 			if dx > 0:
 				dxa = x[i] - atmp
 				dxb = x[i] - btmp
-				assert(dxa >= 0)
-				assert(dxb >= 0)
 				if i > 0:
 					fa = dxa/(x[i] - x[i-1])
 					ya = y[i-1]*fa + y[i]*(1 - fa)
@@ -63,8 +65,6 @@ def interp(
 			if dx > 0:
 				dxa = atmp - x[i]
 				dxb = btmp - x[i]
-				assert(dxa >= 0)
-				assert(dxb >= 0)
 				if i < n - 1:
 					fa = dxa/(x[i+1] - x[i])
 					ya = y[i]*(1 - fa) + y[i+1]*fa
@@ -83,4 +83,36 @@ def interp(
 		if dxtot > 0:
 			y2[i2] /= dxtot
 		i2 += 1
+
+def interp(
+	np.ndarray[double, ndim=1] x not None,
+	np.ndarray[double, ndim=1] xhalf not None,
+	np.ndarray[double, ndim=1] y not None,
+	np.ndarray[double, ndim=1] x2 not None,
+	np.ndarray[double, ndim=1] xhalf2 not None
+):
+	cdef np.ndarray[double, ndim=1] y2 = np.full(len(x2), np.nan, dtype=np.float64)
+	interp1(x, xhalf, y, x2, xhalf2, y2)
+	return y2
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def interp_batch(
+	const double[:,:] x not None,
+	const double[:,:] xhalf not None,
+	const double[:,:,:] y not None,
+	const double[:,:] x2 not None,
+	const double[:,:] xhalf2 not None
+):
+	cdef Py_ssize_t n = y.shape[0]
+	cdef Py_ssize_t l = y.shape[2]
+	cdef Py_ssize_t i = 0
+	cdef Py_ssize_t k = 0
+	y2 = np.full((n, x2.shape[1], l), np.nan, dtype=np.float64)
+	cdef double[:,:,:] y2_view = y2
+	with nogil:
+		for i in range(n):
+			for k in range(l):
+				interp1(x[i], xhalf[i], y[i,:,k], x2[i], xhalf2[i],
+					y2_view[i,:,k])
 	return y2
@@ -4,3 +4,11 @@ def interp(x, xhalf, y, x2, xhalf2):
 	xext = np.concatenate(([xhalf[0]], x, [xhalf[-1]])) if len(x) > 0 else x
 	yext = np.concatenate(([y[0]], y, [y[-1]])) if len(x) > 0 else y
 	return np.interp(x2, xext, yext, left=np.nan, right=np.nan)
+
+def interp_batch(x, xhalf, y, x2, xhalf2):
+	n, m, l = y.shape
+	y2 = np.full((n, x2.shape[1], l), np.nan, np.float64)
+	for i in range(n):
+		for k in range(l):
+			y2[i,:,k] = interp(x[i], xhalf[i], y[i,:,k], x2[i], xhalf2[i])
+	return y2
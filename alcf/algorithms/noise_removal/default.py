@@ -1,30 +1,54 @@
 import numpy as np
 from alcf import misc
 
-def noise_removal(d, **options):
+def scaling(zfull, near_noise):
+	# Range-squared scaling of the noise relative to the highest level and
+	# the near-range noise.
+	c = (1.0*zfull/zfull[...,-1:])**2
+	nn_scale, nn_range = near_noise
+	if nn_scale > 0 and nn_range > 0:
+		nn_lambda = np.log(2)/nn_range
+		nn = nn_scale*np.exp(-zfull*nn_lambda)
+	elif nn_scale == 0:
+		nn = None
+	else:
+		raise ValueError('Near-range noise scale must non-negative and range must be positive')
+	return c, nn
+
+def noise_removal(d, cache=None, **options):
 	b = d['backscatter']
 	zfull = d['zfull']
 	bt = b[:,-1]
-	n, m = b.shape
-	b2 = np.zeros((n, m), np.float64)
-	b_sd = np.zeros((n, m), np.float64)
 	w = d['time_bnds'][:,1] - d['time_bnds'][:,0]
 	noise_m = np.average(bt, weights=w)
 	noise_sd = np.sqrt(np.cov(bt, aweights=w)) if len(bt) > 1 else 0.
-	for i in range(n):
-		c = (1.0*zfull[i,:]/zfull[i,-1])**2
-		b2[i,:] = b[i,:] - noise_m*c
-		b_sd[i,:] = noise_sd*c
-	nn_scale, nn_range = options.get('near_noise', [0, 0])
-	if nn_scale > 0 and nn_range > 0:
-		nn_lambda = np.log(2)/nn_range
-		for i in range(n):
-			near_noise = nn_scale*np.exp(-zfull[i,:]*nn_lambda)
-			b_sd[i,:] += near_noise
-	elif nn_scale == 0:
-		pass
+	near_noise = options.get('near_noise', [0, 0])
+	# Instruments with fixed range gates have the same heights in every
+	# profile. The scaling factors are then calculated for one profile and
+	# reused for subsequent periods with the same heights.
+	zfull0 = zfull.reshape(-1, zfull.shape[-1])[0]
+	if zfull.ndim == 1 or np.all(zfull == zfull0):
+		if cache is not None and \
+			cache.get('near_noise') == list(near_noise) and \
+			np.array_equal(cache.get('zfull'), zfull0):
+			c, nn = cache['c'], cache['nn']
+		else:
+			c, nn = scaling(zfull0, near_noise)
+			if cache is not None:
+				cache.update({
+					'zfull': zfull0,
+					'near_noise': list(near_noise),
+					'c': c,
+					'nn': nn,
+				})
+		c = c[np.newaxis,:]
+		nn = nn[np.newaxis,:] if nn is not None else None
 	else:
-		raise ValueError('Near-range noise scale must non-negative and range must be positive')
+		c, nn = scaling(zfull, near_noise)
+	b2 = np.ma.getdata(b - noise_m*c).astype(b.dtype, copy=False)
+	b_sd = np.broadcast_to(noise_sd*c, b.shape).astype(b.dtype)
+	if nn is not None:
+		b_sd += nn
 	d['backscatter'] = b2
 	d['backscatter_sd'] = b_sd
 	d['.']['backscatter_sd'] = {
@@ -41,4 +65,6 @@ def stream(dd, state, noise_removal_sampling=300, align=True, **options):
 		noise_removal_sampling/60./60./24.,
 		align=align,
 	)
-	return misc.stream(dd, state, noise_removal, **options)
+	state['cache'] = state.get('cache', {})
+	return misc.stream(dd, state, noise_removal, cache=state['cache'],
+		**options)
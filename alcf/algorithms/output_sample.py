@@ -1,55 +1,94 @@
 import copy
 import numpy as np
+import scipy.sparse
 from alcf import misc
 import ds_format as ds
 
+def overlap_matrix(time_bnds, time_half2):
+	# Sparse matrix of the time overlap of the input intervals (columns) with
+	# the output intervals (rows), normalised to a sum of one in every row
+	# with a non-zero overlap. Within a row, the elements are ordered by time.
+	n = time_bnds.shape[0]
+	n2 = len(time_half2) - 1
+	j1 = np.searchsorted(time_half2, time_bnds[:,0], side='right') - 1
+	j2 = np.searchsorted(time_half2, time_bnds[:,1], side='left')
+	j1 = np.clip(j1, 0, n2 - 1)
+	j2 = np.clip(j2, 0, n2)
+	count = np.maximum(j2 - j1, 0)
+	kk = np.repeat(np.arange(n), count)
+	jj = j1[kk] + np.arange(len(kk)) - np.repeat(np.cumsum(count) - count, count)
+	w = np.maximum(0,
+		np.minimum(time_bnds[kk,1], time_half2[jj + 1]) -
+		np.maximum(time_bnds[kk,0], time_half2[jj])
+	)
+	mask = w > 0
+	jj, kk, w = jj[mask], kk[mask], w[mask]
+	order = np.lexsort((kk, jj))
+	jj, kk, w = jj[order], kk[order], w[order]
+	w /= np.bincount(jj, w, minlength=n2)[jj]
+	indptr = np.concatenate([[0], np.cumsum(np.bincount(jj, minlength=n2))])
+	return scipy.sparse.csr_matrix((w, kk, indptr), shape=(n2, n))
+
+def apply_overlap(w, x):
+	# Apply overlap matrix w to x along the first axis. Elements of the
+	# output with no overlapping input are NaN. As the output is accumulated
+	# in time order, a NaN input is discarded if followed by a non-NaN input
+	# in the same output interval, and is retained otherwise. Masked input
+	# elements are accumulated as zero.
+	n2 = w.shape[0]
+	size = x.shape
+	x = np.ma.filled(x, 0.).reshape(size[0], -1)
+	counts = np.diff(w.indptr)
+	nonempty = counts > 0
+	y = np.full((n2, x.shape[1]), np.nan, np.float64)
+	isnan = np.isnan(x) if np.issubdtype(x.dtype, np.floating) \
+		else np.zeros(x.shape, bool)
+	if not np.any(isnan[w.indices]):
+		y[nonempty] = (w @ x)[nonempty]
+	elif np.any(nonempty):
+		nnz = len(w.indices)
+		starts = w.indptr[:-1][nonempty]
+		e = np.arange(nnz)[:,np.newaxis]
+		last_nan = np.maximum.reduceat(
+			np.where(isnan[w.indices], e, -1),
+			starts,
+			axis=0
+		)
+		row = np.repeat(np.arange(len(starts)), counts[nonempty])
+		keep = e > last_nan[row]
+		xw = np.where(keep, x[w.indices]*w.data[:,np.newaxis], 0)
+		# Sum the terms of every row in order.
+		s = scipy.sparse.csr_matrix((np.ones(nnz), np.arange(nnz), w.indptr),
+			shape=(n2, nnz))
+		y2 = (s @ xw)[nonempty]
+		y2[last_nan == w.indptr[1:][nonempty][:,np.newaxis] - 1] = np.nan
+		y[nonempty] = y2
+	return y.reshape([n2] + list(size[1:]))
+
 def output_sample(d, tres, output_sampling, epsilon=1/86400, align=True):
 	t = d['time_bnds'][0,0]
 	if align:
-		r = (t + 0.5 + epsilon) % output_sampling
-		t1 = t - r + epsilon
+		t1 = misc.period_start(t, output_sampling, epsilon)
+		t2 = misc.period_start(t1 + output_sampling, output_sampling, epsilon)
 	else:
 		t1 = t
-	t2 = t1 + output_sampling
+		t2 = t1 + output_sampling
 
-	dims = ds.get_dims(d)
-	n = dims['time']
 	n2 = int(output_sampling/tres)
-	time = d['time']
 	time_bnds = d['time_bnds']
 
 	time_half2 = np.linspace(t1, t2, n2 + 1)
 	time2 = 0.5*(time_half2[1:] + time_half2[:-1])
 
+	w = overlap_matrix(time_bnds, time_half2)
+
 	for var in ds.vars(d):
 		if 'time' not in d['.'][var]['.dims']:
 			continue
 		i = d['.'][var]['.dims'].index('time')
-		x = d[var]
-		size = x.shape
-		size2 = list(size)
-		size2[i] = n2
-		x2 = np.full(size2, np.nan, dtype=x.dtype)
-		for j in range(n2):
-			mask = np.maximum(0,
-				np.minimum(time_bnds[:,1], time_half2[j + 1]) -
-				np.maximum(time_bnds[:,0], time_half2[j])
-			)
-			s = np.sum(mask)
-			if s > 0.:
-				mask /= np.sum(mask)
-			sel2 = tuple([
-				slice(None) if l != i else j
-				for l in range(len(size))
-			])
-			for k in np.argwhere(mask > 0):
-				sel = tuple([
-					slice(None) if l != i else k
-					for l in range(len(size))
-				])
-				x2[sel2] = np.where(np.isnan(x2[sel2])*mask[k], 0, x2[sel2]) + \
-					x[sel]*mask[k]
-		d[var] = x2
+		x = np.moveaxis(d[var], i, 0)
+		x2 = apply_overlap(w, x).astype(x.dtype)
+		d[var] = np.moveaxis(x2, 0, i)
 	d['time'] = time2
 	d['time_bnds'] = np.full((n2, 2), np.nan, np.float64)
 	d['time_bnds'][:,0] = time_half2[:-1]
@@ -84,6 +84,7 @@ def init_hist(d, s, var, ndim, x1, x2, res, log=False):
 		))
 	else:
 		s[var+'_half'] = np.arange(x1, x2 + res, res)
+	s[var+'_log'] = log
 	s[var+'_full'] = misc.full(s[var+'_half'])
 	o = len(s[var+'_full'])
 	k = 2 if ndim == 1 else 1
@@ -194,20 +195,68 @@ def sel(d, var, time=None, level=None, column=None):
 		a += [column]
 	return d[var][tuple(a)]
 
+HISTOGRAM_BLOCK = 65536
+
+def histogram(x, edges, mask, log=False):
+	# Histograms of x along the first axis for every element of the other
+	# axes, counting only elements where mask is true. The bins are closed on
+	# the left, and the last bin is also closed on the right, as in
+	# np.histogram. The edges are expected to be uniform (or uniform in log
+	# space if log is true), which allows the bin indices to be calculated
+	# directly. x is processed in blocks of about HISTOGRAM_BLOCK elements so
+	# that the temporary arrays stay in the CPU cache. Returns an array of
+	# counts with the bins as the first axis.
+	x = np.ma.getdata(x)
+	mask = np.broadcast_to(mask, x.shape)
+	nbins = len(edges) - 1
+	shape = x.shape[1:]
+	size = int(np.prod(shape))
+	pos = np.arange(size).reshape(shape)
+	if log:
+		t0, t1 = np.log(edges[0]), np.log(edges[-1])
+	else:
+		t0, t1 = edges[0], edges[-1]
+	step = (t1 - t0)/nbins
+	counts = np.zeros((nbins + 1)*size, np.int64)
+	block = max(1, HISTOGRAM_BLOCK//max(size, 1))
+	for a in range(0, x.shape[0], block):
+		xa = x[a:(a + block)]
+		valid = mask[a:(a + block)] & (xa >= edges[0]) & (xa <= edges[-1])
+		with np.errstate(invalid='ignore', divide='ignore'):
+			j = np.floor(((np.log(xa) if log else xa) - t0)/step)
+		j = np.fmin(np.fmax(j, 0), nbins - 1).astype(np.intp)
+		# Correct for rounding errors in the calculated indices.
+		j -= xa < edges[j]
+		j += xa >= edges[j + 1]
+		np.minimum(j, nbins - 1, out=j)
+		i = np.where(valid, j*size + pos, nbins*size)
+		counts += np.bincount(i.ravel(), minlength=(nbins + 1)*size)
+	return counts[:nbins*size].reshape([nbins] + list(shape))
+
 def hist(d, s, var, ndim, mask, level=None):
+	x = d[var]
+	dims = ds.dims(d, var)
 	if ndim == 1:
-		for k in range(s['size'][2]):
-			s[var+'_hist'][:,k] += np.histogram(
-				sel(d, var, mask[:,k], level, k),
-				bins=s[var+'_half']
-			)[0]
+		if level is not None and ('level' in dims or 'zfull' in dims):
+			x = x[:,level]
+		if 'column' not in dims:
+			x = np.broadcast_to(x[:,np.newaxis], mask.shape)
 	else:
-		for j in range(s['size'][1]):
-			for k in range(s['size'][2]):
-				s[var+'_hist'][:,j,k] += np.histogram(
-					sel(d, var, mask[:,k], j, k),
-					bins=s[var+'_half']
-				)[0]
+		mask = mask[:,np.newaxis,:]
+	s[var+'_hist'] += histogram(x, s[var+'_half'], mask, s[var+'_log'])
+
+def accumulate(acc, x, mask):
+	# Add the sum of x along the first axis where mask is true to acc.
+	acc += np.sum(np.where(mask, np.ma.getdata(x), 0), axis=0)
+
+def nearest(z, x):
+	# Index of the nearest element of z to each element of x. If z is
+	# increasing, it is found by bisection. Ties resolve to the lower index
+	# like np.argmin.
+	if len(z) < 2 or not np.all(np.diff(z) > 0):
+		return np.argmin(np.abs(z[np.newaxis,:] - x[:,np.newaxis]), axis=1)
+	j = np.clip(np.searchsorted(z, x), 1, len(z) - 1)
+	return np.where(np.abs(z[j-1] - x) <= np.abs(z[j] - x), j - 1, j)
 
 def create_filter_mask(filters, time, l):
 	n = len(time)
@@ -226,7 +275,7 @@ def create_filter_mask(filters, time, l):
 	return filter_mask
 
 def create_mask(d, filter, filters_exclude, filters_include,
-	tlim, lon_lim, lat_lim):
+	tlim, lon_lim, lat_lim, sun_altitude_method='noaa'):
 
 	n = ds.dim(d, 'time')
 	l = ds.dim(d, 'column')
@@ -252,22 +301,18 @@ def create_mask(d, filter, filters_exclude, filters_include,
 		mask &= np.any(d['cloud_mask'], axis=1)
 	if 'clear' in filter:
 		mask &= ~np.any(d['cloud_mask'], axis=1)
-	if 'day' in filter:
-		tmp = np.zeros(n, bool)
-		tmp[llm] = misc.sun_altitude(
+	if 'day' in filter or 'night' in filter:
+		alt = np.full(n, np.nan, np.float64)
+		alt[llm] = misc.sun_altitude(
 			d['time'][llm],
 			d['lon'][llm],
-			d['lat'][llm]
-			) >= 0
-		mask &= np.tile(tmp, [l, 1]).T
-	if 'night' in filter:
-		tmp = np.zeros(n, bool)
-		tmp[llm] = misc.sun_altitude(
-			d['time'][llm],
-			d['lon'][llm],
-			d['lat'][llm]
-			) < 0
-		mask &= np.tile(tmp, [l, 1]).T
+			d['lat'][llm],
+			method=sun_altitude_method,
+		)
+		if 'day' in filter:
+			mask &= np.tile(alt >= 0, [l, 1]).T
+		if 'night' in filter:
+			mask &= np.tile(alt < 0, [l, 1]).T
 
 	if filters_exclude is not None:
 		mask &= ~create_filter_mask(filters_exclude, d['time'], l)
@@ -277,6 +322,29 @@ def create_mask(d, filter, filters_exclude, filters_include,
 
 	return mask
 
+def map_profiles(d, s, mask):
+	n = ds.dim(d, 'time')
+	mask3 = mask[:,np.newaxis,:]
+	cloud_mask = np.ma.getdata(d['cloud_mask'])
+	dt = 24*60*60*(d['time_bnds'][:,1] - d['time_bnds'][:,0])
+	accumulate(s['cl'], cloud_mask, mask3)
+	cbh = np.ma.getdata(d['cbh'])
+	ii, kk = np.nonzero(mask & np.isfinite(cbh))
+	np.add.at(s['cbh'], (nearest(s['zfull2'], cbh[ii,kk]), kk), 1)
+	accumulate(s['backscatter_avg'], d['backscatter'], mask3)
+	if 'backscatter_mol' in ds.vars(d):
+		accumulate(s['backscatter_mol_avg'],
+			d['backscatter_mol'][:,:,np.newaxis], mask3)
+	s['n'] += np.sum(mask, axis=0)
+	accumulate(s['time_total'], dt[:,np.newaxis], mask)
+	accumulate(s['clt'], np.any(cloud_mask, axis=1), mask)
+	for var in s['keep_vars']:
+		x = np.ma.getdata(d[var])
+		valid = ~np.any(np.isnan(x.reshape(n, -1)), axis=1)
+		mask_var = mask & valid[:,np.newaxis]
+		accumulate(s[var+'_avg'], x[:,np.newaxis], mask_var)
+		s[var+'_n'] += np.sum(mask_var, axis=0)
+
 def stats_map(d, s,
 	tlim=None,
 	blim=None,
@@ -298,6 +366,7 @@ def stats_map(d, s,
 	keep_vars_lim={},
 	keep_vars_log={},
 	keep_vars_res={},
+	sun_altitude_method='noaa',
 	**kwargs
 ):
 	n = ds.dim(d, 'time')
@@ -336,7 +405,7 @@ def stats_map(d, s,
 		s['initialized'] = True
 
 	mask = create_mask(d, filter, filters_exclude, filters_include,
-		tlim, lon_lim, lat_lim)
+		tlim, lon_lim, lat_lim, sun_altitude_method)
 
 	if not np.any(mask):
 		return
@@ -348,29 +417,51 @@ def stats_map(d, s,
 		if var+'_hist' in s:
 			hist(d, s, var, 1, mask)
 
-	for i in range(n):
-		dt = 24*60*60*(d['time_bnds'][i,1] - d['time_bnds'][i,0])
-		for k in range(s['size'][2]):
-			if not mask[i,k]:
-				continue
-			s['cl'][:,k] += d['cloud_mask'][i,:,k]
-			if np.isfinite(d['cbh'][i,k]):
-				j = np.argmin(np.abs(s['zfull2'] - d['cbh'][i,k]))
-				s['cbh'][j,k] += 1
-			s['backscatter_avg'][:,k] += d['backscatter'][i,:,k]
-			if 'backscatter_mol' in ds.vars(d):
-				s['backscatter_mol_avg'][:,k] += d['backscatter_mol'][i,:]
-			s['n'][k] += 1
-			s['time_total'][k] += dt
-			s['clt'][k] += np.any(d['cloud_mask'][i,:,k])
-			for var in s['keep_vars']:
-				if not np.any(np.isnan(d[var][i])):
-					s[var+'_avg'][...,k] += sel(d, var, i, None, k)
-					s[var+'_n'][k] += 1
+	map_profiles(d, s, mask)
+
+def accumulators(s):
+	# Names of the additive variables of state s.
+	vars_ = ['backscatter_avg', 'backscatter_hist', 'n', 'time_total', 'clt',
+		'cl', 'cbh']
+	if 'backscatter_mol_avg' in s:
+		vars_ += ['backscatter_mol_avg']
+	if 'backscatter_sd_hist' in s:
+		vars_ += ['backscatter_sd_hist']
+	for var in s['keep_vars']:
+		for suffix in ['avg', 'n', 'hist']:
+			if var+'_'+suffix in s:
+				vars_ += [var+'_'+suffix]
+	return vars_
+
+def combine(s1, s2):
+	# Combine partial state s2 into state s1. The states must be created by
+	# stats_map with the same options on inputs with the same levels and
+	# columns. Returns the combined state.
+	if not s2.get('initialized'):
+		return s1
+	if not s1.get('initialized'):
+		return s2
+	for var in accumulators(s1):
+		if var in s2:
+			s1[var] += s2[var]
+	# Variables which are only in s2, such as backscatter_sd_hist if the input
+	# of s1 has no backscatter_sd, are copied together with their histogram
+	# bins and metadata.
+	for var in s2.keys():
+		if var not in s1:
+			s1[var] = copy.deepcopy(s2[var])
+	for var in s2['meta'].keys():
+		if var not in s1['meta']:
+			s1['meta'][var] = copy.deepcopy(s2['meta'][var])
+	s1['keep_vars'] = s1['keep_vars'] + \
+		[var for var in s2['keep_vars'] if var not in s1['keep_vars']]
+	if s2.get('expanded_column'):
+		s1['expanded_column'] = True
+	return s1
 
 def reduce_var(s, var, var_n):
 	def interp(x):
-		return algorithms.interp(
+		return algorithms.interp_batch(
 			s['interp'],
 			s['zfull'],
 			s['zhalf'],
@@ -378,24 +469,19 @@ def reduce_var(s, var, var_n):
 			s['zfull2'],
 			s['zhalf2']
 		)
-	size = list(s[var].shape)
-	size2 = copy.copy(size)
 	dims = s['meta'][var]['.dims']
 	dims2 = copy.copy(dims)
 	try: i = dims.index('zfull')
 	except ValueError: i = None
 	if i is not None:
-		size2[i] = len(s['zfull2'])
 		dims2[i] = 'zfull2'
-	tmp = np.full(size2, np.nan)
+	if s[var].ndim == 3 and dims[1] == 'zfull':
+		tmp = interp(s[var])
+	elif s[var].ndim == 2 and dims[0] == 'zfull':
+		tmp = interp(s[var][np.newaxis])[0]
+	else:
+		tmp = np.array(s[var], np.float64)
 	for k in range(s['size'][2]):
-		if s[var].ndim == 3 and dims[1] == 'zfull':
-			for i in range(s[var].shape[0]):
-				tmp[i,:,k] = interp(s[var][i,:,k])
-		elif s[var].ndim == 2 and dims[0] == 'zfull':
-			tmp[:,k] = interp(s[var][:,k])
-		else:
-			tmp[...,k] = s[var][...,k]
 		tmp[...,k] = tmp[...,k]/s[var_n][k] \
 			if s[var_n][k] > 0 \
 			else np.nan
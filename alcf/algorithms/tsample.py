@@ -14,12 +14,15 @@ def tsample(d, tres):
 	if 'backscatter_sd' in d:
 		n = d['backscatter_sd'].shape[0]
 		shape1 = list(d['backscatter_sd'].shape[1:])
+		dtype = d['backscatter_sd'].dtype
 		d['backscatter_sd'] = np.sqrt(1./n*np.average(
 			d['backscatter_sd']**2,
 			axis=0,
 			weights=w,
 		))
 		d['backscatter_sd'] = d['backscatter_sd'].reshape([1] + shape1)
+		if dtype == np.float32:
+			d['backscatter_sd'] = d['backscatter_sd'].astype(dtype)
 	for var in ds.vars(d):
 		if var in ('time', 'time_bnds', 'backscatter_sd'):
 			continue
@@ -27,9 +30,13 @@ def tsample(d, tres):
 			continue
 		i = d['.'][var]['.dims'].index('time')
 		shape = list(d[var].shape)
+		dtype = d[var].dtype
 		d[var] = np.average(d[var], axis=i, weights=w)
 		shape[i] = 1
 		d[var] = d[var].reshape(shape)
+		# float32 variables are averaged in float64 and stored as float32.
+		if dtype == np.float32:
+			d[var] = d[var].astype(dtype)
 
 def stream(dd, state, tres=None, align=True, **options):
 	if tres is not None:
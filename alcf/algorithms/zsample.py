@@ -10,11 +10,7 @@ def zsample(d, zres=None, zlim=None, interp=None):
 		return
 
 	zfull = d['zfull']
-	zhalf = np.zeros((n, m+1), dtype=np.float64)
-	for i in range(n):
-		zhalf[i,:] = misc.half(zfull[i,:]) \
-			if zfull.ndim == 2 \
-			else misc.half(zfull)
+	zhalf = misc.half(zfull)
 	zhalf2 = np.arange(zlim[0], zlim[-1] + zres, zres, np.float64)
 	zfull2 = (zhalf2[1:] + zhalf2[:-1])*0.5
 	m2 = len(zfull2)
@@ -29,20 +25,10 @@ def zsample(d, zres=None, zlim=None, interp=None):
 		x = np.moveaxis(x, [i, j], [0, 1])
 		shape = list(x.shape)
 		x = x.reshape(n, m, -1)
-		shape2 = list(x.shape)
-		shape2[1] = m2
-		l = shape2[2]
-		x2 = np.zeros(shape2, dtype=x.dtype)
 		if var == 'backscatter_sd':
 			x = x**2
-		for i2 in range(n):
-			for j2 in range(l):
-				x2[i2,:,j2] = algorithms.interp(
-					interp,
-					zfull[i2,:] if zfull.ndim == 2 else zfull, zhalf[i2,:],
-					x[i2,:,j2],
-					zfull2, zhalf2
-				)
+		x2 = algorithms.interp_batch(interp, zfull, zhalf, x, zfull2, zhalf2)
+		x2 = x2.astype(x.dtype, copy=False)
 		if var == 'backscatter_sd':
 			x2 = np.sqrt(x2)
 		x2 = x2.reshape([n, m2] + shape[2:])
@@ -1,23 +1,14 @@
-from . import convert
-from . import model
-from . import simulate
-from . import lidar
-from . import stats
-from . import compare
-from . import plot
-from . import calibrate
-from . import auto
-from . import download
+from alcf.lazy import LazyMapping
 
-CMDS = {
-	'convert': convert.run,
-	'model': model.run,
-	'simulate': simulate.run,
-	'lidar': lidar.run,
-	'stats': stats.run,
-	'compare': compare.run,
-	'plot': plot.run,
-	'calibrate': calibrate.run,
-	'auto': auto.run,
-	'download': download.run,
-}
+CMDS = LazyMapping({
+	'convert': '.convert:run',
+	'model': '.model:run',
+	'simulate': '.simulate:run',
+	'lidar': '.lidar:run',
+	'stats': '.stats:run',
+	'compare': '.compare:run',
+	'plot': '.plot:run',
+	'calibrate': '.calibrate:run',
+	'auto': '.auto:run',
+	'download': '.download:run',
+}, __name__)
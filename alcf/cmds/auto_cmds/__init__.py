@@ -1,9 +1,7 @@
-from . import model
-from . import lidar
-from . import compare
+from alcf.lazy import LazyMapping
 
-CMDS = {
-	'model': model.run,
-	'lidar': lidar.run,
-	'compare': compare.run,
-}
+CMDS = LazyMapping({
+	'model': '.model:run',
+	'lidar': '.lidar:run',
+	'compare': '.compare:run',
+}, __name__)
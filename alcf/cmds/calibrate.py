@@ -1,4 +1,5 @@
 import os
+from warnings import warn
 import ds_format as ds
 import numpy as np
 import aquarius_time as aq
@@ -79,10 +80,19 @@ Read time periods from `time_periods.txt`, lidar profiles from the directory `li
 	lidar = LIDARS.get(type_)
 	params = lidar.params(type_)
 	tp = read_time_periods(time_periods)
-	files = sorted(os.listdir(input_))
+	filenames = [os.path.join(input_, file_)
+		for file_ in misc.listdir(input_)]
+	# Only files overlapping with the time periods are read.
+	if len(tp) > 0:
+		warnings = []
+		filenames = misc.select_files(input_, filenames,
+			filters=[np.array(tp, np.float64)],
+			warnings=warnings,
+		)
+		for w in warnings:
+			warn(w[0] if len(w) == 2 else w)
 	lr = []
-	for file_ in files:
-		filename = os.path.join(input_, file_)
+	for filename in filenames:
 		misc.log_input(filename)
 		d = ds.read(filename, ['time'])
 		mask = np.zeros(len(d['time']), dtype=bool)
@@ -1,6 +1,8 @@
 import os
 import traceback
 import glob
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from warnings import warn
 import numpy as np
 import ds_format as ds
@@ -12,6 +14,7 @@ from alcf.algorithms.cloud_detection import CLOUD_DETECTION
 from alcf.algorithms.cloud_base_detection import CLOUD_BASE_DETECTION
 from alcf.algorithms import tsample, zsample, output_sample, lidar_ratio
 from alcf.algorithms import couple as couple_mod
+from alcf.algorithms import fused as fused_mod
 from alcf import misc
 import pst
 
@@ -27,6 +30,19 @@ VARIABLES = [
 	'lat',
 ]
 
+# Variables converted to the floating point type of the dtype option. Other
+# variables are converted to float64.
+DTYPE_VARIABLES = [
+	'backscatter',
+	'backscatter_mol',
+	'backscatter_sd',
+]
+
+DTYPES = {
+	'float32': np.float32,
+	'float64': np.float64,
+}
+
 REQ_VARIABLES = [
 	'backscatter',
 	'time',
@@ -51,29 +67,291 @@ def fill_track(d, vars, track):
 	if track is None:
 		return
 	if 'lon' in vars or 'lat' in vars:
-		res = [misc.track_at(track, t) for t in d['time']]
+		lon, lat = misc.track_at(track, d['time'])
 	if 'lon' in vars:
-		d['lon'] = np.array([x[0] for x in res])
+		d['lon'] = lon
 	if 'lat' in vars:
-		d['lat'] = np.array([x[1] for x in res])
+		d['lat'] = lat
 
 def read(type_, lidar, input_, vars, *args,
 	altitude=None,
 	lon=None,
 	lat=None,
 	track=None,
+	block=None,
 	**kwargs,
 ):
-	d = lidar.read(type_, input_, vars, *args, altitude=altitude, **kwargs)
-	if d is not None:
+	# Yield the input in blocks of at most block profiles if supported by
+	# the lidar type, or else all profiles at once.
+	if block is not None and hasattr(lidar, 'read_blocks'):
+		dd = lidar.read_blocks(type_, input_, vars, block, *args,
+			altitude=altitude,
+			**kwargs
+		)
+	else:
+		dd = [lidar.read(type_, input_, vars, *args,
+			altitude=altitude,
+			**kwargs
+		)]
+	for d in dd:
+		if d is None: continue
 		fill_default(d, 'altitude', altitude, 0)
 		fill_default(d, 'lon', lon, np.nan)
 		fill_default(d, 'lat', lat, np.nan)
 		fill_track(d, vars, track)
-	return d
+		yield d
+
+def time_extent(type_, filename):
+	lidar = LIDARS[type_]
+	d = lidar.read(type_, filename, ['time', 'time_bnds'])
+	if d is None or len(d['time']) == 0:
+		return None
+	return [d['time_bnds'][0,0], d['time_bnds'][-1,1]]
+
+def split_files(files, extents, period, n, margin, epsilon=1/86400):
+	kk = set()
+	for ext in extents:
+		if ext is None:
+			continue
+		k1 = misc.period_index(ext[0], period, epsilon)
+		k2 = misc.period_index(ext[1], period, epsilon)
+		kk |= set(np.arange(k1, k2 + 1))
+	if len(kk) == 0:
+		return []
+	kk = np.array(sorted(kk))
+	groups = np.array_split(kk, min(n, len(kk)))
+	tt = [-np.inf] + [k[0]*period - 0.5 for k in groups[1:]] + [np.inf]
+	chunks = []
+	for t1, t2 in zip(tt[:-1], tt[1:]):
+		files1 = [
+			file_ for file_, ext in zip(files, extents)
+			if ext is not None and \
+				ext[1] >= t1 - margin and \
+				ext[0] <= t2 + margin
+		]
+		chunks += [[files1, [t1, t2]]]
+	return chunks
+
+def worker(type_, files, output, output_tlim, kwargs, options):
+	process_files(type_, files, output,
+		output_tlim=output_tlim,
+		**kwargs,
+		**options
+	)
+
+def process_files(type_, files, output, *,
+	altitude,
+	block,
+	tres,
+	time,
+	tshift,
+	zres,
+	zlim,
+	cloud_detection,
+	cloud_base_detection,
+	noise_removal,
+	calibration,
+	output_sampling,
+	couple,
+	fix_cl_range,
+	cl_crit_range,
+	fused,
+	dtype,
+	lat,
+	lon,
+	keep_vars,
+	align_output,
+	debug,
+	interp,
+	track,
+	output_tlim=None,
+	strict=False,
+	epsilon=1/86400,
+	**options
+):
+	lidar = LIDARS[type_]
+
+	time1 = None
+	if time is not None:
+		time1 = [aq.from_iso(time[0]), aq.from_iso(time[1])]
+
+	noise_removal_mod = None
+	calibration_mod = None
+	cloud_detection_mod = None
+	cloud_base_detection_mod = None
+
+	if type_ not in ('default', 'cosp') and noise_removal is not None:
+		noise_removal_mod = NOISE_REMOVAL[noise_removal]
+	if calibration is not None:
+		calibration_mod = CALIBRATION[calibration]
+	if cloud_detection is not None:
+		cloud_detection_mod = CLOUD_DETECTION[cloud_detection]
+	if cloud_base_detection is not None:
+		cloud_base_detection_mod = CLOUD_BASE_DETECTION[cloud_base_detection]
+
+	def write(d, output):
+		if len(d['time']) == 0:
+			return
+		t1 = d['time_bnds'][0,0]
+		if output_tlim is not None and not (
+			t1 >= output_tlim[0] - epsilon and
+			t1 < output_tlim[1] - epsilon
+		):
+			return
+		t1 = np.round(t1*86400.)/86400.
+		filename = os.path.join(output, '%s.nc' % aq.to_iso(t1).replace(':', ''))
+		ds.write(filename, d)
+		misc.log_output(filename)
+		return []
+
+	def output_stream(dd, state, output_sampling=None, **options):
+		return misc.stream(dd, state, write, output=output)
+
+	def preprocess(d, tshift=None):
+		misc.require_vars(d, REQ_VARIABLES)
+		for var in VARIABLES:
+			if var in d:
+				d[var] = d[var].astype(
+					DTYPES[dtype] if var in DTYPE_VARIABLES else np.float64
+				)
+		for var in ds.vars(d):
+			if var.startswith('input_'):
+				d[var] = d[var].astype(DTYPES[dtype], copy=False)
+		if tshift is not None:
+			d['time'] += tshift/86400.
+			d['time_bnds'] += tshift/86400.
+		return d
+
+	def process(dd, state, **options):
+		state['preprocess'] = state.get('preprocess', {})
+		state['noise_removal'] = state.get('noise_removal', {})
+		state['calibration'] = state.get('calibration', {})
+		state['tsample'] = state.get('tsample', {})
+		state['zsample'] = state.get('zsample', {})
+		state['output_sample'] = state.get('output_sample', {})
+		state['output_sample_2'] = state.get('output_sample_2', {})
+		state['cloud_detection'] = state.get('cloud_detection', {})
+		state['cloud_base_detection'] = state.get('cloud_base_detection', {})
+		state['lidar_ratio'] = state.get('lidar_ratio', {})
+		state['output'] = state.get('output', {})
+		state['couple'] = state.get('couple', {})
+		dd = misc.stream(dd, state['preprocess'], preprocess, tshift=tshift)
+		if couple is not None:
+			dd = couple_mod.stream(dd, state['couple'], couple, interp=interp)
+		if noise_removal_mod is not None:
+			dd = noise_removal_mod.stream(dd, state['noise_removal'],
+				align=align_output,
+				**options
+			)
+		if calibration_mod is not None:
+			dd = calibration_mod.stream(dd, state['calibration'], **options)
+		if zres is not None or zlim is not None:
+			dd = zsample.stream(dd, state['zsample'],
+				zres=zres, zlim=zlim, interp=interp)
+		if tres is not None or time is not None:
+			dd = tsample.stream(dd, state['tsample'],
+				tres=tres/86400.,
+				align=align_output
+			)
+		if output_sampling is not None:
+			dd = output_sample.stream(dd, state['output_sample'],
+				tres=tres/86400.,
+				output_sampling=output_sampling/86400.,
+				align=align_output,
+			)
+			dd = misc.aggregate(
+				dd,
+				state['output_sample_2'],
+				output_sampling/86400.,
+				align=align_output,
+			)
+		#for d in dd:
+		#	if d is not None:
+		#		print(aq.to_iso(d['time_bnds'][0,0]), aq.to_iso(d['time_bnds'][-1,1]))
+		if cloud_detection_mod is not None:
+			dd = cloud_detection_mod.stream(dd, state['cloud_detection'],
+				**options
+			)
+		if cloud_base_detection_mod is not None:
+			dd = cloud_base_detection_mod.stream(
+				dd,
+				state['cloud_base_detection'],
+				**options
+			)
+		dd = lidar_ratio.stream(dd, state['lidar_ratio'])
+		dd = output_stream(dd, state['output'])
+		return dd
+
+	def process_fused(dd, state, **options):
+		state['preprocess'] = state.get('preprocess', {})
+		state['noise_removal'] = state.get('noise_removal', {})
+		state['tsample'] = state.get('tsample', {})
+		state['output_sample'] = state.get('output_sample', {})
+		state['output_sample_2'] = state.get('output_sample_2', {})
+		state['detection'] = state.get('detection', {})
+		state['output'] = state.get('output', {})
+		dd = misc.stream(dd, state['preprocess'], preprocess, tshift=tshift)
+		if noise_removal_mod is not None:
+			dd = fused_mod.stream_noise(dd, state['noise_removal'],
+				align=align_output,
+				**options
+			)
+		if calibration_mod is None:
+			options = {k: v for k, v in options.items()
+				if k != 'calibration_coeff'}
+		dd = fused_mod.stream_tsample(dd, state['tsample'],
+			tres=tres/86400.,
+			align=align_output,
+			zres=zres,
+			zlim=zlim,
+			interp=interp,
+			**options
+		)
+		dd = output_sample.stream(dd, state['output_sample'],
+			tres=tres/86400.,
+			output_sampling=output_sampling/86400.,
+			align=align_output,
+		)
+		dd = misc.aggregate(
+			dd,
+			state['output_sample_2'],
+			output_sampling/86400.,
+			align=align_output,
+		)
+		dd = fused_mod.stream_detection(dd, state['detection'], **options)
+		dd = output_stream(dd, state['output'])
+		return dd
+
+	process_ = process_fused if fused else process
+	state = {}
+	for file_ in files:
+		misc.log_input(file_)
+		try:
+			for d in read(type_, lidar, file_, VARIABLES,
+				altitude=altitude,
+				lon=lon,
+				lat=lat,
+				track=track,
+				block=block,
+				fix_cl_range=fix_cl_range,
+				cl_crit_range=cl_crit_range,
+				tlim=time1,
+				keep_vars=keep_vars,
+			):
+				dd = process_([d], state, **options)
+		except SystemExit:
+			raise
+		except SystemError:
+			raise
+		except Exception as e:
+			if strict: raise
+			if debug: warn('%s: %s' % (file_, traceback.format_exc()))
+			else: warn('%s: %s' % (file_, str(e)))
+	dd = process_([None], state, **options)
 
 def run(type_, input_, output,
 	altitude=None,
+	block=10000,
 	tres=300,
 	time=None,
 	tshift=0.,
@@ -89,6 +367,8 @@ def run(type_, input_, output,
 	couple=None,
 	fix_cl_range=False,
 	cl_crit_range=6000,
+	fused=False,
+	dtype='float64',
 	lat=None,
 	lon=None,
 	r=False,
@@ -98,6 +378,7 @@ def run(type_, input_, output,
 	interp='area_linear',
 	track=None,
 	track_gap=21600,
+	njobs=1,
 	**options
 ):
 	"""
@@ -158,6 +439,7 @@ Options
 
 - `align_output: <value>`: Align output time periods to the nearest multiple of output_sampling. Default: `true`.
 - `altitude: <altitude>`: Altitude of the instrument (m). Default: Taken from lidar data or `0` if not available. If defined, the values in the input data is overriden.
+- `block: <n>`: Maximum number of profiles read from an input file at once or `none` to read whole files. Long input files are read and processed in blocks of profiles, so that the memory use does not depend on the file size. Currently supported by the `cl61`, `minimpl` and `mpl` lidar types. The output does not depend on the block size. Default: `10000`.
 - `bsd: <value>`: Assume a given standard deviation of backscatter noise when detecting clouds or `none` to use the value calculated by the noise removal algorithm from observed backscatter if available (m^-1.sr^-1). The value applies at height `bsd_z` and is range-scaled for other heights. A suitable value can be taken from a plot generated by `alcf plot backscatter_sd_hist`. Default: `none`.
 - `bsd_z: <value>`: Height at which `bsd` applies (m). Default: `8000`.
 - `calibration: <algorithm>`: Backscatter calibration algorithm. Available algorithms: `default`, `none`. Default: `default`.
@@ -165,15 +447,18 @@ Options
 - `cl_crit_range: <range>`: Critical range for the `fix_cl_range` option (m). Default: 6000.
 - `cloud_detection: <algorithm>`: Cloud detection algorithm. Available algorithms: `default`, `none`. Default: `default`.
 - `cloud_base_detection: <algorithm>`: Cloud base detection algorithm. Available algorithms: `default`, `none`. Default: `default`.
+- `dtype: <value>`: Floating point type of backscatter, backscatter standard deviation and the variables kept with `keep_vars` during processing and in the output: `float64` or `float32`. `float32` reduces the memory use and the size of the output, with differences in the results within the precision of the instrument. Other variables, such as time, are always `float64`. Default: `float64`.
 - `--fix_cl_range`: Fix CL31/CL51 range correction (if `noise_h2` firmware option if off). The critical range is taken from `cl_crit_range`.
+- `fused: <value>`: Enable/disable fused processing (`true` or `false`). Fused processing does noise removal, calibration, time and height resampling in a single pass over the time sampling period, and cloud detection, cloud base detection and lidar ratio calculation in a single pass over the output period. It is faster, and the results are the same as without fused processing up to floating point rounding. Time sampling periods containing non-finite or masked input values are processed profile by profile as without fused processing. It is only available with the `default` or `none` noise removal and calibration algorithms, the `default` cloud detection and cloud base detection algorithms, without `couple`, and with `tres`, `zres`, `zlim` and `output_sampling` defined. Default: `false`.
 - `interp: <value>`: Vertical interpolation method. `area_block` for area-weighting with block interpolation, `area_linear` for area-weighting with linear interpolation or `linear` for simple linear interpolation. Default: `area_linear`.
-- `keep_vars: { <var>... }`: Keep the listed input variables. The variable must be numerical and have a time dimension. The variable is resampled in the same way as backscatter along their time and level dimensions. The data type is changed to float64. Its name is prefixed with `input_`, except for type `default`, in which it is expected to be already prefixed in the input. When processing `alcf simulate` output, the variables need to be kept by the model reading module (by changing the code) and by `alcf simulate` (by using the keep_vars option). Default: `{ }`.
+- `keep_vars: { <var>... }`: Keep the listed input variables. The variable must be numerical and have a time dimension. The variable is resampled in the same way as backscatter along their time and level dimensions. The data type is changed to float64, or float32 if `dtype` is `float32`. Its name is prefixed with `input_`, except for type `default`, in which it is expected to be already prefixed in the input. When processing `alcf simulate` output, the variables need to be kept by the model reading module (by changing the code) and by `alcf simulate` (by using the keep_vars option). Default: `{ }`.
 - `lat: <lat>`: Latitude of the instrument (degrees North). Default: Taken from lidar data or `none` if not available. If defined, the values in the input data is overriden.
 - `lon: <lon>`: Longitude of the instrument (degrees East). Default: Taken from lidar data or `none` if not available. If defined, the values in the input data is overriden.
+- `njobs: <n>`: Number of parallel jobs. If greater than 1 and the input is a directory, the input files are split into time-contiguous chunks aligned to the output sampling periods, which are processed in parallel. The output is the same as with serial processing. Parallel processing requires `output_sampling` to be defined and `align_output` to be enabled, otherwise the input is processed serially. Default: `1`.
 - `noise_removal: <algorithm>`: Noise removal algorithm. Available algorithms: `default`, `none`.  Default: `default`.
 - `output_sampling: <period>`: Output sampling period (seconds). Default: `86400` (24 hours).
 - `-r`: Process the input directory recursively.
-- `time: { <low> <high> }`: Time limits (see Time format below). Default: `none`.
+- `time: { <low> <high> }`: Time limits (see Time format below). If the input is a directory, input files outside of the time limits are skipped without reading them, based on the time extents of the files stored in a catalogue of the directory in the cache directory (see Environment in `alcf --help`), which is updated when files are added or changed. Default: `none`.
 - `track: <file>`, `track: { <file>... }`: One or more track NetCDF files (see Files below). Longitude and latitude is assigned to the profiles based on the track and profile time. If multiple files are supplied and `time_bnds` is not present in the files, they are assumed to be multiple segments of a discontinous track unless the last and first time of adjacent tracks are the same. `track` takes precedence over `lat` and `lon`. Default: `none`.
 - `track_gap: <interval>`: If the interval is not 0, a track file is supplied, the `time_bnds` variable is not defined in the file and any two adjacent points are separated by more than the specified time interval (seconds), then a gap is assumed to be present between the two data points, instead of interpolating location between the two points. Default: `21600` (6 hours).
 - `tres: <tres>`: Time resolution (seconds). Default: `300` (5 min).
@@ -240,186 +525,143 @@ Process Vaisala CL51 data in `cl51_nc` and store the output in `cl51_alcf_lidar`
 
     alcf lidar cl51 cl51_nc cl51_alcf_lidar altitude: 100
 	"""
-	# if time is not None:
-	# 	start, end = misc.parse_time(time)
-
 	lidar = LIDARS.get(type_)
 	if lidar is None:
 		raise ValueError('Invalid type: %s' % type_)
 
 	params = lidar.params(type_)
 
-	time1 = None
 	if time is not None:
-		time1 = [None, None]
 		for i in 0, 1:
-			time1[i] = aq.from_iso(time[i])
-			if time1[i] is None:
+			if aq.from_iso(time[i]) is None:
 				raise ValueError('Invalid time format: %s' % time[i])
 
 	d_track = misc.read_track(track, track_gap/86400.) \
 		if track is not None \
 		else None
 
-	noise_removal_mod = None
-	calibration_mod = None
-	cloud_detection_mod = None
-	cloud_base_detection_mod = None
-
 	if type_ not in ('default', 'cosp') and noise_removal is not None:
-		noise_removal_mod = NOISE_REMOVAL.get(noise_removal)
-		if noise_removal_mod is None:
+		if noise_removal not in NOISE_REMOVAL:
 			raise ValueError('Invalid noise removal algorithm: %s' % noise_removal)
 
 	if calibration is not None:
-		calibration_mod = CALIBRATION.get(calibration)
-		if calibration_mod is None:
+		if calibration not in CALIBRATION:
 			raise ValueError('Invalid calibration algorithm: %s' % calibration)
 
 	if cloud_detection is not None:
-		cloud_detection_mod = CLOUD_DETECTION.get(cloud_detection)
-		if cloud_detection_mod is None:
+		if cloud_detection not in CLOUD_DETECTION:
 			raise ValueError('Invalid cloud detection algorithm: %s' % cloud_detection)
 
 	if cloud_base_detection is not None:
-		cloud_base_detection_mod = CLOUD_BASE_DETECTION.get(cloud_base_detection)
-		if cloud_base_detection_mod is None:
+		if cloud_base_detection not in CLOUD_BASE_DETECTION:
 			raise ValueError('Invalid cloud base detection algorithm: %s' % cloud_base_detection)
 
+	if fused and (
+		cloud_detection != 'default' or
+		cloud_base_detection != 'default' or
+		noise_removal not in ('default', None) or
+		calibration not in ('default', None) or
+		couple is not None or
+		None in (tres, zres, zlim, output_sampling)
+	):
+		raise ValueError('Fused processing requires the default cloud detection and cloud base detection, default or no noise removal and calibration, no coupling, and tres, zres, zlim and output_sampling to be defined')
+
+	if dtype not in DTYPES:
+		raise ValueError('Invalid dtype: %s' % dtype)
+
 	if calibration_file is not None:
 		c = read_calibration_file(calibration_file)
 		calibration_coeff = c[b'calibration_coeff']/params['calibration_coeff']
 	else:
 		calibration_coeff = 1.
 
-	def write(d, output):
-		if len(d['time']) == 0:
-			return
-		t1 = d['time_bnds'][0,0]
-		t1 = np.round(t1*86400.)/86400.
-		filename = os.path.join(output, '%s.nc' % aq.to_iso(t1).replace(':', ''))
-		ds.write(filename, d)
-		misc.log_output(filename)
-		return []
-
-	def output_stream(dd, state, output_sampling=None, **options):
-		return misc.stream(dd, state, write, output=output)
-
-	def preprocess(d, tshift=None):
-		misc.require_vars(d, REQ_VARIABLES)
-		for var in VARIABLES:
-			if var in d:
-				d[var] = d[var].astype(np.float64)
-		if tshift is not None:
-			d['time'] += tshift/86400.
-			d['time_bnds'] += tshift/86400.
-		return d
-
-	def process(dd, state, **options):
-		state['preprocess'] = state.get('preprocess', {})
-		state['noise_removal'] = state.get('noise_removal', {})
-		state['calibration'] = state.get('calibration', {})
-		state['tsample'] = state.get('tsample', {})
-		state['zsample'] = state.get('zsample', {})
-		state['output_sample'] = state.get('output_sample', {})
-		state['output_sample_2'] = state.get('output_sample_2', {})
-		state['cloud_detection'] = state.get('cloud_detection', {})
-		state['cloud_base_detection'] = state.get('cloud_base_detection', {})
-		state['lidar_ratio'] = state.get('lidar_ratio', {})
-		state['output'] = state.get('output', {})
-		state['couple'] = state.get('couple', {})
-		dd = misc.stream(dd, state['preprocess'], preprocess, tshift=tshift)
-		if couple is not None:
-			dd = couple_mod.stream(dd, state['couple'], couple, interp=interp)
-		if noise_removal_mod is not None:
-			dd = noise_removal_mod.stream(dd, state['noise_removal'],
-				align=align_output,
-				**options
-			)
-		if calibration_mod is not None:
-			dd = calibration_mod.stream(dd, state['calibration'], **options)
-		if zres is not None or zlim is not None:
-			dd = zsample.stream(dd, state['zsample'],
-				zres=zres, zlim=zlim, interp=interp)
-		if tres is not None or time is not None:
-			dd = tsample.stream(dd, state['tsample'],
-				tres=tres/86400.,
-				align=align_output
-			)
-		if output_sampling is not None:
-			dd = output_sample.stream(dd, state['output_sample'],
-				tres=tres/86400.,
-				output_sampling=output_sampling/86400.,
-				align=align_output,
-			)
-			dd = misc.aggregate(
-				dd,
-				state['output_sample_2'],
-				output_sampling/86400.,
-				align=align_output,
-			)
-		#for d in dd:
-		#	if d is not None:
-		#		print(aq.to_iso(d['time_bnds'][0,0]), aq.to_iso(d['time_bnds'][-1,1]))
-		if cloud_detection_mod is not None:
-			dd = cloud_detection_mod.stream(dd, state['cloud_detection'],
-				**options
-			)
-		if cloud_base_detection_mod is not None:
-			dd = cloud_base_detection_mod.stream(
-				dd,
-				state['cloud_base_detection'],
-				**options
-			)
-		dd = lidar_ratio.stream(dd, state['lidar_ratio'])
-		dd = output_stream(dd, state['output'])
-		return dd
-
-	options['output'] = output
 	options['calibration_coeff'] = calibration_coeff
 
-	state = {}
-	if os.path.isdir(input_):
-		pattern = '**/*.nc' if r else '*.nc'
-		files = sorted(glob.glob(os.path.join(
-			glob.escape(input_),
-			pattern
-		), recursive=r))
-		for file_ in files:
-			if not os.path.isfile(file_):
-				continue
-			misc.log_input(file_)
-			try:
-				d = read(type_, lidar, file_, VARIABLES,
-					altitude=altitude,
-					lon=lon,
-					lat=lat,
-					track=d_track,
-					fix_cl_range=fix_cl_range,
-					cl_crit_range=cl_crit_range,
-					tlim=time1,
-					keep_vars=keep_vars,
-				)
-				if d is None: continue
-				dd = process([d], state, **options)
-			except SystemExit:
-				raise
-			except SystemError:
-				raise
-			except Exception as e:
-				if debug: warn('%s: %s' % (file_, traceback.format_exc()))
-				else: warn('%s: %s' % (file_, str(e)))
-		dd = process([None], state, **options)
-	else:
-		misc.log_input(input_)
-		d = read(type_, lidar, input_, VARIABLES,
-			altitude=altitude,
-			lon=lon,
-			lat=lat,
-			track=d_track,
-			fix_cl_range=fix_cl_range,
-			cl_crit_range=cl_crit_range,
-			tlim=time1,
-			keep_vars=keep_vars,
+	kwargs = {
+		'altitude': altitude,
+		'block': block,
+		'tres': tres,
+		'time': time,
+		'tshift': tshift,
+		'zres': zres,
+		'zlim': zlim,
+		'cloud_detection': cloud_detection,
+		'cloud_base_detection': cloud_base_detection,
+		'noise_removal': noise_removal,
+		'calibration': calibration,
+		'output_sampling': output_sampling,
+		'couple': couple,
+		'fix_cl_range': fix_cl_range,
+		'cl_crit_range': cl_crit_range,
+		'fused': fused,
+		'dtype': dtype,
+		'lat': lat,
+		'lon': lon,
+		'keep_vars': keep_vars,
+		'align_output': align_output,
+		'debug': debug,
+		'interp': interp,
+		'track': d_track,
+	}
+
+	if not os.path.isdir(input_):
+		process_files(type_, [input_], output, strict=True, **kwargs, **options)
+		return
+
+	pattern = '**/*.nc' if r else '*.nc'
+	files = sorted(glob.glob(os.path.join(
+		glob.escape(input_),
+		pattern
+	), recursive=r))
+	files = [file_ for file_ in files if os.path.isfile(file_)]
+
+	parallel = njobs > 1 and \
+		len(files) >= 2 and \
+		output_sampling is not None and \
+		tres is not None and \
+		align_output
+
+	# Time extents of the input files from the catalogue of the input
+	# directory. Files outside of the time limits are not read.
+	if time is not None or parallel:
+		warnings = []
+		extents = misc.catalogue(input_, files, type_,
+			extent_f=partial(time_extent, type_),
+			warnings=warnings,
+			njobs=njobs,
 		)
-		dd = process([d, None], state, **options)
+		for w in warnings:
+			if len(w) == 2:
+				if debug: warn('%s\n%s' % (w[0], w[1]))
+				else: warn(w[0])
+			else:
+				warn(w)
+		if time is not None:
+			tlim = [aq.from_iso(time[0]), aq.from_iso(time[1])]
+			mask = [misc.overlaps(ext, tlim) for ext in extents]
+			files = [x for x, m in zip(files, mask) if m]
+			extents = [x for x, m in zip(extents, mask) if m]
+
+	if not parallel or len(files) < 2:
+		process_files(type_, files, output, **kwargs, **options)
+		return
+
+	# Aggregation periods which can extend beyond the boundary of an output
+	# period. Files within this margin of a chunk are read by both adjacent
+	# chunks so that the boundary periods are complete.
+	margin = max(tres, options.get('noise_removal_sampling', 300))/86400.
+	extents = [
+		None if ext is None or ext is False else
+		[ext[0] + tshift/86400., ext[1] + tshift/86400.]
+		for ext in extents
+	]
+	chunks = split_files(files, extents, output_sampling/86400., njobs,
+		margin)
+	with ProcessPoolExecutor(max_workers=njobs) as ex:
+		fs = [
+			ex.submit(worker, type_, files1, output, output_tlim, kwargs,
+				options)
+			for files1, output_tlim in chunks
+		]
+		for f in fs:
+			f.result()
@@ -45,6 +45,11 @@ Options
 - `--debug`: Enable debugging information.
 - `--help`: Print general help or help for a command and exit.
 - `--version`: Print version and exit.
+
+Environment
+-----------
+
+- `ALCF_CACHE_DIR`: Directory where indexes and time catalogues of input directories are stored, which are used to avoid reading unchanged input files again. Default: `alcf` in `XDG_CACHE_HOME` or `~/.cache`.
 '''
 	if 'version' in kwargs:
 		print(__version__)
@@ -490,6 +490,7 @@ def run(plot_type, *args,
 	title=None,
 	zres=50,
 	render='antialiased',
+	tlim=None,
 	**kwargs
 ):
 	'''
@@ -538,6 +539,7 @@ General options
 - `render: <value>`: Render profiles anti-aliased (`antialiased`) or standard (`standard`). Standard is more suitable for short time intervals. Default: `antialiased`.
 - `subcolumn: <value>`: Model subcolumn to plot. Default: `0`.
 - `title: <value>`: Plot title.
+- `tlim: { <start> <end> }`: Time limits of input files (see Time format below). If the input is a directory, only input files overlapping with the time limits are plotted. The files are selected without reading them, based on the time extents of the files stored in a catalogue of the directory in the cache directory (see Environment in `alcf --help`), which is updated when files are added or changed. Default: `none`.
 - `width: <value>`: Plot width (inches). Default: `5` if `plot_type` is `cloud_occurrence` or `backscatter_hist` else `10`.
 
 backscatter options
@@ -588,6 +590,11 @@ cbh and cloud_occurrence options
 - `xlim: { <min> <max> }`: x axis limits (%). Default: `{ 0 100 }`.
 - `zlim: { <min> <max> }`: z axis limits (m). Default: `{ 0 15 }`.
 
+Time format
+-----------
+
+`YYYY-MM-DD[THH:MM[:SS]]`, where `YYYY` is year, `MM` is month, `DD` is day, `HH` is hour, `MM` is minute, `SS` is second. Example: `2000-01-01T00:00:00`.
+
 Examples
 --------
 
@@ -630,6 +637,8 @@ Plot backscatter from processed Vaisala CL51 data in `alcf_cl51_lidar` and store
 	if vlog is not None: opts['vlog'] = vlog
 	if zres is not None: opts['zres'] = zres
 
+	tlim_jd = misc.parse_time(tlim) if tlim is not None else None
+
 	state = {}
 	if plot_type in ('cbh', 'cloud_occurrence', 'backscatter_sd_hist'):
 		dd = []
@@ -646,8 +655,15 @@ Plot backscatter from processed Vaisala CL51 data in `alcf_cl51_lidar` and store
 	elif plot_type in ('backscatter', 'clw', 'cli', 'clw+cli', 'cl'):
 		for input1 in input_:
 			if os.path.isdir(input1):
-				for file_ in sorted(os.listdir(input1)):
-					filename = os.path.join(input1, file_)
+				filenames = [os.path.join(input1, file_)
+					for file_ in misc.listdir(input1)]
+				warnings = []
+				filenames = misc.select_files(input1, filenames, tlim_jd,
+					warnings=warnings)
+				for w in warnings:
+					warn(w[0] if len(w) == 2 else w)
+				for filename in filenames:
+					file_ = os.path.basename(filename)
 					output_filename = os.path.join(
 						output,
 						os.path.splitext(file_)[0] + '.png'
@@ -1,9 +1,13 @@
 import os
 import copy
 import tempfile
+import traceback
 from warnings import warn
 from string import Template
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import netCDF4
 import ds_format as ds
 import alcf
 from alcf import misc
@@ -142,29 +146,60 @@ OVERLAP = {
 	'maximum-random': 3,
 }
 
-def cosp_alcf(config, input_, output, keep_vars=[]):
-	_, config_filename = tempfile.mkstemp('.nml', prefix='alcf_config_', text=False)
-	try:
-		with open(config_filename, 'w') as f:
-			f.write(config)
-		program = os.path.join(os.path.dirname(__file__), '../cosp_alcf')
-		subprocess.call([program, config_filename, input_, output])
-	finally:
-		os.unlink(config_filename)
+def append(filename, d, attrs):
+	'''Append variables in dataset d to an existing NetCDF file and replace
+	its global attributes with attrs, without rewriting the file.'''
+	with netCDF4.Dataset(filename, 'a') as f:
+		for var in ds.vars(d):
+			x = ds.var(d, var)
+			dims = ds.dims(d, var)
+			for dim, size in zip(dims, x.shape):
+				if dim not in f.dimensions:
+					f.createDimension(dim, size)
+			var_attrs = {
+				k: v for k, v in ds.attrs(d, var).items()
+				if k != '_FillValue'
+			}
+			fill_value = ds.attr(d, '_FillValue', var=var)
+			if np.ma.isMaskedArray(x) and fill_value is None:
+				fill_value = netCDF4.default_fillvals.get(x.dtype.str[1:])
+			if var in f.variables:
+				v = f.variables[var]
+			else:
+				v = f.createVariable(var, x.dtype, dims, fill_value=fill_value)
+			v.setncatts(var_attrs)
+			v[...] = x
+		for k in f.ncattrs():
+			f.delncattr(k)
+		f.setncatts(attrs)
+
+def cosp_alcf(config_filename, input_, output, keep_vars=[]):
+	program = os.path.join(os.path.dirname(__file__), '../cosp_alcf')
+	subprocess.call([program, config_filename, input_, output])
 	misc.log_input(output)
-	d = ds.read(output)
-	if len(keep_vars) > 0:
-		di = ds.read(input_, keep_vars)
-		for var in keep_vars:
-			ds.var(d, var, ds.var(di, var))
-			ds.meta(d, var, ds.meta(di, var))
-	d['.']['.'] = alcf.META
-	ds.write(output, d)
+	di = ds.read(input_, keep_vars) if len(keep_vars) > 0 else {}
+	append(output, di, alcf.META)
 	misc.log_output(output)
 
+def worker(config_filename, input_filename, output_filename, keep_vars=[],
+	debug=False):
+	file_ = os.path.basename(input_filename)
+	misc.log_input(input_filename)
+	try:
+		d = ds.read(input_filename, VARS)
+		misc.require_vars(d, VARS)
+	except Exception as e:
+		if debug: warn('%s: %s' % (file_, traceback.format_exc()))
+		else: warn('%s: %s' % (file_, str(e)))
+		return
+	cosp_alcf(config_filename, input_filename, output_filename,
+		keep_vars=keep_vars
+	)
+
 def run(type_, input_, output,
 	keep_vars=[],
 	ncolumns=10,
+	njobs=1,
 	overlap='maximum-random',
 	debug=False,
 	**kwargs
@@ -208,6 +243,7 @@ Options
 
 - `keep_vars: { <var>... }`: Keep the listed input variables. The variables are expected to be prefixed with `input_` in the input. Default: `{ }`.
 - `ncolumns: <ncolumns>`: Number of SCOPS subcolumns to generate. Default: `10`.
+- `njobs: <n>`: Number of COSP instances to run in parallel if the input is a directory. Default: `1`.
 - `overlap: <overlap>`: Cloud overlap assumption in the SCOPS subcolumn generator. `maximum` for maximum overlap, `random` for random overlap, or `maximum-random` for maximum-random overlap. Default: `maximum-random`.
 
 Examples
@@ -239,28 +275,46 @@ Simulate a Vaisala CL51 instrument from model data in `alcf_merra2_model` previo
 		surface_lidar=(1 if params['surface_lidar'] else 0),
 	)
 
+	if njobs < 1:
+		raise ValueError('njobs must be at least 1')
+
 	keep_vars_prefixed = ['input_' + var for var in keep_vars]
 
-	if os.path.isfile(input_):
-		misc.log_input(input_)
-		cosp_alcf(config, input_, output,
-			keep_vars=keep_vars_prefixed
-		)
-	else:
-		files = sorted(os.listdir(input_))
-		for file_ in files:
-			input_filename = os.path.join(input_, file_)
-			output_filename = os.path.join(output, file_)
-			if not os.path.isfile(input_filename):
-				continue
-			misc.log_input(input_filename)
-			try:
-				d = ds.read(input_filename, VARS)
-				misc.require_vars(d, VARS)
-			except Exception as e:
-				if debug: warn('%s: %s' % (file_, traceback.format_exc()))
-				else: warn('%s: %s' % (file_, str(e)))
-				continue
-			cosp_alcf(config, input_filename, output_filename,
+	fd, config_filename = tempfile.mkstemp('.nml', prefix='alcf_config_',
+		text=False)
+	try:
+		with os.fdopen(fd, 'w') as f:
+			f.write(config)
+		if os.path.isfile(input_):
+			misc.log_input(input_)
+			cosp_alcf(config_filename, input_, output,
 				keep_vars=keep_vars_prefixed
 			)
+			return
+		jobs = [
+			(os.path.join(input_, file_), os.path.join(output, file_))
+			for file_ in sorted(os.listdir(input_))
+			if os.path.isfile(os.path.join(input_, file_))
+		]
+		if njobs == 1:
+			for input_filename, output_filename in jobs:
+				worker(config_filename, input_filename, output_filename,
+					keep_vars=keep_vars_prefixed,
+					debug=debug,
+				)
+		else:
+			with ProcessPoolExecutor(max_workers=njobs) as ex:
+				fs = [
+					ex.submit(worker,
+						config_filename,
+						input_filename,
+						output_filename,
+						keep_vars=keep_vars_prefixed,
+						debug=debug,
+					)
+					for input_filename, output_filename in jobs
+				]
+				for f in fs:
+					f.result()
+	finally:
+		os.unlink(config_filename)
@@ -1,6 +1,10 @@
 import os
 import sys
+import json
+import hashlib
 from fractions import Fraction
+from concurrent.futures import ProcessPoolExecutor
+from warnings import warn
 import numpy as np
 import ds_format as ds
 import alcf
@@ -26,25 +30,34 @@ def read_filters(filters):
 	else:
 		return [ds.read(filters)]
 
-def get_filenames(input_):
+def get_filenames(input_, tlim=None, filters=[]):
+	# Files of an input directory are selected by the time limits and
+	# filters based on the catalogue of the directory. At least one file is
+	# kept so that the statistics are initialized.
 	filenames = []
 	if os.path.isdir(input_):
-		files = sorted(os.listdir(input_))
+		files = misc.listdir(input_)
 		for file_ in files:
 			filename = os.path.join(input_, file_)
 			if not os.path.isfile(filename):
 				continue
 			filenames += [filename]
+		warnings = []
+		selected = misc.select_files(input_, filenames, tlim, filters,
+			warnings=warnings)
+		for w in warnings:
+			warn(w[0] if len(w) == 2 else w)
+		filenames = selected if len(selected) > 0 else filenames[:1]
 	else:
 		filenames += [input_]
 	return filenames
 
-def create_common_filter(input_):
+def create_common_filter(input_, tlim=None):
 	time_bnds = []
 	times = set()
 	for input1 in input_:
 		dd = []
-		for filename in get_filenames(input1):
+		for filename in get_filenames(input1, tlim):
 			misc.log_input(filename)
 			d = ds.read(filename, ['time_bnds'])
 			dd += [d]
@@ -95,6 +108,125 @@ def merge(dd):
 				create_columns(d, vars, n)
 	return ds.merge(dd, 'input')
 
+def map_files(filenames, vars, options):
+	state = {}
+	for filename in filenames:
+		misc.log_input(filename)
+		d = ds.read(filename, vars)
+		stats.stream([d], state, **options)
+	return state.get('state', {})
+
+PARTIALS_EXT = '.npz'
+PARTIALS_VERSION = 2
+
+def encode_option(x):
+	# JSON representation of option values which are not JSON types.
+	if isinstance(x, np.ndarray):
+		return x.tolist()
+	if isinstance(x, np.generic):
+		return x.item()
+	if isinstance(x, Fraction):
+		return str(x)
+	raise TypeError('cannot encode option of type %s' % type(x).__name__)
+
+def partials_key(options):
+	# Partial statistics are calculated for whole days, and are only valid
+	# for the same options other than tlim.
+	opts = {k: v for k, v in options.items() if k != 'tlim'}
+	s = json.dumps(opts, sort_keys=True, default=encode_option)
+	return hashlib.sha1(s.encode('utf-8')).hexdigest()
+
+def partials_filename(dirname, filename):
+	return os.path.join(dirname, os.path.basename(filename) + PARTIALS_EXT)
+
+def read_partials(filename, header_only=False):
+	# A partials file is an index (see misc.write_index) containing the
+	# header and a list of the start of the day and the partial state, so
+	# that the header can be checked without reading the states.
+	keys = ['version', 'key', 'options']
+	try:
+		p = misc.read_index(filename, keys=(keys if header_only else None))
+	except Exception:
+		return None, None
+	if not isinstance(p, dict) or p.get('version') != PARTIALS_VERSION:
+		return None, None
+	header = {k: p.get(k) for k in keys}
+	days = None if header_only else dict(p['days'])
+	return header, days
+
+def write_partials(filename, header, days):
+	misc.write_index(filename, dict(header,
+		days=[[day, days[day]] for day in sorted(days.keys())],
+	))
+
+def map_days(filename, partials_filename, vars, options, key):
+	misc.log_input(filename)
+	d = ds.read(filename, vars)
+	days = {}
+	for day in np.unique(np.floor(d['time'] + 0.5) - 0.5):
+		state = {}
+		stats.stream([d], state, **dict(options, tlim=[day, day + 1]))
+		if state['state'].get('initialized'):
+			days[float(day)] = state['state']
+	header = {
+		'version': PARTIALS_VERSION,
+		'key': misc.index_key(filename),
+		'options': key,
+	}
+	write_partials(partials_filename, header, days)
+	misc.log_output(partials_filename)
+
+def combine_partials(filenames, key, tlim=None):
+	s = {}
+	for filename in filenames:
+		misc.log_input(filename)
+		header, days = read_partials(filename)
+		if header is None:
+			raise IOError('%s: cannot read partial statistics' % filename)
+		if header['options'] != key:
+			raise ValueError('%s: partial statistics were calculated with different options' % filename)
+		for day in sorted(days.keys()):
+			if tlim is None or (day >= tlim[0] and day < tlim[1]):
+				s = stats.combine(s, days[day])
+	return s
+
+def map_reduce(filenames, vars, options, njobs=1, partials=None):
+	if partials is not None:
+		key = partials_key(options)
+		os.makedirs(partials, exist_ok=True)
+		partials_filenames = [partials_filename(partials, filename)
+			for filename in filenames]
+		update = []
+		for filename, filename2 in zip(filenames, partials_filenames):
+			header, _ = read_partials(filename2, header_only=True)
+			if header is None or \
+				header['key'] != misc.index_key(filename) or \
+				header['options'] != key:
+				update += [(filename, filename2)]
+		if njobs <= 1 or len(update) < 2:
+			for filename, filename2 in update:
+				map_days(filename, filename2, vars, options, key)
+		else:
+			with ProcessPoolExecutor(max_workers=njobs) as ex:
+				fs = [
+					ex.submit(map_days, filename, filename2, vars, options, key)
+					for filename, filename2 in update
+				]
+				for f in fs:
+					f.result()
+		s = combine_partials(partials_filenames, key, options['tlim'])
+	elif njobs <= 1 or len(filenames) < 2:
+		s = map_files(filenames, vars, options)
+	else:
+		n = min(njobs, len(filenames))
+		chunks = [list(x) for x in np.array_split(filenames, n)]
+		with ProcessPoolExecutor(max_workers=n) as ex:
+			fs = [ex.submit(map_files, chunk, vars, options) for chunk in chunks]
+			s = {}
+			for f in fs:
+				s = stats.combine(s, f.result())
+	return stats.stream([None], {'state': s}, **options)
+
 def run(*args,
 	tlim=None,
 	blim=[5., 200.],
@@ -114,6 +246,10 @@ def run(*args,
 	label=None,
 	lon_lim=None,
 	keep_vars=[],
+	njobs=1,
+	partials=None,
+	combine=False,
+	sun_altitude_method='noaa',
 	**kwargs
 ):
 	'''
@@ -148,6 +284,7 @@ Options
 - `bsd_res: <value>`: Backscatter standard deviation histogram resolution (10^-6 m-1.sr-1). Default: `0.001`.
 - `bsd_z: <value>`: Backscatter standard deviation histogram height (m). Default: `8000`.
 - `clt_res: <value>`: Total cloud fraction histogram resolution (%). Can also be specified as a fraction (`1/<n>`). Default: `1/9`.
+- `combine: <value>`: Combine partial statistics stored with the `partials` option instead of reading lidar data (`true` or `false`). If enabled, the input is a directory of partial statistics. The options other than `tlim` must be the same as when the partial statistics were stored. `tlim` is applied with a resolution of whole days (days starting within `tlim` are included). Default: `false`.
 - `filter: <value> | { <value> ... }`: Filter profiles by condition: `cloudy` for cloudy profiles only, `clear` for clear sky profiles only, `night` for nighttime profiles, `day` for daytime profiles, `none` for all profiles. If an array of values is supplied, all conditions must be true. For `night` and `day`, lidar profiles must contain valid longitude and latitude fields set via the `lon` and `lat` arguments of `alcf lidar` or read implicitly from raw lidar data files if available (mpl, mpl2nc). Default: `none`.
 - `filter_exclude: <value> | { <value>... }`: Filter by a mask defined in a NetCDF file, described below under Filter file. If multiple files are supplied, they must all apply for a profile to be excluded.
 - `filter_include: <value> | { <value>... }`: The same as `filter_exclude`, but with time intervals to be included in the result. If both are defined, `filter_include` takes precedence. If multiple files are supplied, they must all apply for a profile to be included.
@@ -156,7 +293,10 @@ Options
 - `lat_lim: { <from> <to> }`: Latitude limits. Default: `none`.
 - `label: { <value...> }`: Input labels. Default: `none`.
 - `lon_lim: { <from> <to> }`: Longitude limits. Default: `none`.
-- `tlim: { <start> <end> }`: Time limits (see Time format below). Default: `none`.
+- `njobs: <n>`: Number of parallel jobs. If greater than 1, the input files are split into contiguous chunks, which are processed in parallel, and the partial statistics are combined. The result is the same as with serial processing up to floating point rounding. Default: `1`.
+- `partials: <dir>`: Store partial statistics of the input files in a directory. Partial statistics are stored per input file and day, and are only recalculated if the input file or the options other than `tlim` change. The output is calculated by combining the partial statistics, which can also be done later with the `combine` option. `tlim` is applied with a resolution of whole days (days starting within `tlim` are included). Only a single input is supported. Default: `none`.
+- `sun_altitude_method: <value>`: Solar altitude calculation method for the `day` and `night` filters: `noaa` for the NOAA solar calculator algorithm or `astropy` for the slower reference calculation with astropy, which can classify a small number of profiles near sunrise and sunset differently. Default: `noaa`.
+- `tlim: { <start> <end> }`: Time limits (see Time format below). If the input is a directory, input files outside of the time limits or the include filters are skipped without reading them, based on the time extents of the files stored in a catalogue of the directory in the cache directory (see Environment in `alcf --help`), which is updated when files are added or changed. Default: `none`.
 - *var*`_lim: { <start> <end> }`: Limits for a variable *var* in `keep_vars`.
 - *var*`_log: <value>`: Limits for a variable *var* in `keep_vars`. Enable/disable logarithmic scale of a variable *var* in `keep_vars` (`true` or `false`). Default: `false`.
 - *var*`_res: { <start> <end> }`: Limits for a variable *var* in `keep_vars`.
@@ -185,6 +325,12 @@ Calculate statistics from processed lidar data in `alcf_cl51_lidar` and store th
 	input_ = args[:-1]
 	output = args[-1]
 
+	if (partials is not None or combine) and len(input_) > 1:
+		raise ValueError('partials and combine can only be used with a single input')
+
+	if sun_altitude_method not in misc.SUN_ALTITUDE:
+		raise ValueError('Invalid sun_altitude_method: %s' % sun_altitude_method)
+
 	tlim_jd = misc.parse_time(tlim) if tlim is not None else None
 
 	if lon_lim is not None:
@@ -226,6 +372,7 @@ Calculate statistics from processed lidar data in `alcf_cl51_lidar` and store th
 		'keep_vars_lim': keep_vars_lim,
 		'keep_vars_log': keep_vars_log,
 		'keep_vars_res': keep_vars_res,
+		'sun_altitude_method': sun_altitude_method,
 	}
 
 	if filter_exclude is not None:
@@ -237,19 +384,35 @@ Calculate statistics from processed lidar data in `alcf_cl51_lidar` and store th
 		options['filters_include'] = [d['time_bnds'] for d in dd]
 
 	if len(input_) > 1:
-		common_filter = create_common_filter(input_)
+		common_filter = create_common_filter(input_, tlim_jd)
 		options['filters_include'] = options.get('filters_include', []) + \
 			[common_filter]
 
+	if njobs < 1:
+		raise ValueError('njobs must be at least 1')
+
 	dd = []
 	for input1 in input_:
-		state = {}
-		dd1 = []
-		for filename in get_filenames(input1):
-			misc.log_input(filename)
-			d = ds.read(filename, vars)
-			dd1 = stats.stream([d], state, **options)
-		dd1 = stats.stream([None], state, **options)
+		if combine:
+			filenames = [filename for filename in get_filenames(input1)
+				if filename.endswith(PARTIALS_EXT)]
+			s = combine_partials(filenames, partials_key(options),
+				options['tlim'])
+			dd1 = stats.stream([None], {'state': s}, **options)
+		else:
+			# With partials, tlim is applied with a resolution of whole days.
+			tlim1 = options['tlim']
+			if tlim1 is not None and partials is not None:
+				tlim1 = [
+					np.floor(tlim1[0] + 0.5) - 0.5,
+					np.floor(tlim1[1] + 0.5) + 0.5,
+				]
+			filenames = get_filenames(input1, tlim1,
+				options.get('filters_include', []))
+			dd1 = map_reduce(filenames, vars, options,
+				njobs=njobs,
+				partials=partials,
+			)
 		if dd1[0] == {}:
 			raise RuntimeError('%s: no input files' % input1)
 		else:
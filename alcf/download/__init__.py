@@ -1,7 +1,6 @@
-from . import era5
-from . import merra2
+from alcf.lazy import LazyMapping
 
-MODELS = {
-	'era5': era5,
-	'merra2': merra2,
-}
+MODELS = LazyMapping({
+	'era5': '.era5',
+	'merra2': '.merra2',
+}, __name__)
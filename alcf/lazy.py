@@ -0,0 +1,28 @@
+import importlib
+from collections.abc import Mapping
+
+class LazyMapping(Mapping):
+	'''Read-only mapping of names to modules or module attributes, which are
+	imported on first access. Values are module names, optionally followed
+	by ":" and an attribute name. Relative module names are resolved
+	against package.'''
+
+	def __init__(self, items, package=None):
+		self._items = dict(items)
+		self._package = package
+		self._cache = {}
+
+	def __getitem__(self, key):
+		if key not in self._cache:
+			name, _, attr = self._items[key].partition(':')
+			value = importlib.import_module(name, self._package)
+			if attr != '':
+				value = getattr(value, attr)
+			self._cache[key] = value
+		return self._cache[key]
+
+	def __iter__(self):
+		return iter(self._items)
+
+	def __len__(self):
+		return len(self._items)
@@ -1,4 +1,5 @@
 import alcf
+from alcf.lazy import LazyMapping
 
 META = {
 	'time': {
@@ -65,32 +66,21 @@ META = {
 	'.': alcf.META,
 }
 
-from . import \
-	blview, \
-	caliop, \
-	chm15k, \
-	vaisala, \
-	cl61, \
-	cloudnet, \
-	default, \
-	mpl, \
-	mpl2nc
-
-LIDARS = {
-	'blview': blview,
-	'caliop': caliop,
-	'chm15k': chm15k,
-	'cl31': vaisala,
-	'cl51': vaisala,
-	'cl61': cl61,
-	'cn_cl31': cloudnet,
-	'cn_cl51': cloudnet,
-	'cn_ct25k': cloudnet,
-	'cn_minimpl': cloudnet,
-	'cosp': default,
-	'ct25k': vaisala,
-	'default': default,
-	'minimpl': mpl,
-	'mpl2nc': mpl2nc,
-	'mpl': mpl,
-}
+LIDARS = LazyMapping({
+	'blview': '.blview',
+	'caliop': '.caliop',
+	'chm15k': '.chm15k',
+	'cl31': '.vaisala',
+	'cl51': '.vaisala',
+	'cl61': '.cl61',
+	'cn_cl31': '.cloudnet',
+	'cn_cl51': '.cloudnet',
+	'cn_ct25k': '.cloudnet',
+	'cn_minimpl': '.cloudnet',
+	'cosp': '.default',
+	'ct25k': '.vaisala',
+	'default': '.default',
+	'minimpl': '.mpl',
+	'mpl2nc': '.mpl2nc',
+	'mpl': '.mpl',
+}, __name__)
@@ -32,19 +32,16 @@ def read(
 	**kwargs
 ):
 	p = params(type_)
-	sel = None
-	if tlim is not None:
-		d = ds.read(filename, 'time')
-		misc.require_vars(d, ['time'])
-		d['time'] = d['time']/86400. + 2440587.5
-		d['time_bnds'] = misc.time_bnds(d['time'])
-		mask = misc.time_mask(d['time_bnds'], tlim[0], tlim[1])
-		if np.sum(mask) == 0: return None
-		sel = { 'timeDim': mask }
 
 	dep_vars = misc.dep_vars(VARS, vars)
 	req_vars = dep_vars + DEFAULT_VARS + keep_vars
-	d = ds.read(filename, req_vars, sel=sel, full=True)
+	d = misc.read_window(filename, req_vars, tlim,
+		dim='timeDim',
+		time_bnds_f=lambda d: misc.time_bnds(d['time']/86400. + 2440587.5),
+		time_jd=False,
+		full=True,
+	)
+	if d is None: return None
 	misc.require_vars(d, req_vars)
 	dx = {}
 	misc.populate_meta(dx, META, set(vars) & set(VARS))
@@ -63,15 +60,14 @@ def read(
 			dx['altitude'] = d['altitude'][:,0].astype(np.float64).filled(np.nan)
 	if 'zfull' in vars:
 		range_ = d['range'].astype(np.float64).filled(np.nan)
-		dx['zfull'] = np.tile(range_, (n, 1))
-		dx['zfull'] = (dx['zfull'].T + dx['altitude']).T
+		misc.set_zfull(dx, range_, dx['altitude'])
 	if 'backscatter' in vars:
 		profile_data = d['profile_data'].astype(np.float64).filled(np.nan)
 		dx['backscatter'] = profile_data*p['calibration_coeff']
 		j = np.max(np.nonzero(np.any(np.isfinite(dx['backscatter']), axis=0)))
 		dx['backscatter'] = dx['backscatter'][:,:(j + 1)]
 		if 'zfull' in vars:
-			dx['zfull'] = dx['zfull'][:,:(j + 1)]
+			dx['zfull'] = dx['zfull'][...,:(j + 1)]
 	for var in keep_vars:
 		misc.keep_var(var, d, dx, {'time': 'timeDim', 'level': 'range'})
 	return dx
@@ -32,18 +32,11 @@ def read(
 	**kwargs
 ):
 	p = params(type_)
-	sel = None
-	if tlim is not None:
-		d = ds.read(filename, 'time', jd=True)
-		misc.require_vars(d, ['time'])
-		d['time_bnds'] = misc.time_bnds(d['time'])
-		mask = misc.time_mask(d['time_bnds'], tlim[0], tlim[1])
-		if np.sum(mask) == 0: return None
-		sel = {'time': mask}
 
 	dep_vars = misc.dep_vars(VARS, vars)
 	req_vars = dep_vars + DEFAULT_VARS + keep_vars
-	d = ds.read(filename, req_vars, jd=True, sel=sel, full=True)
+	d = misc.read_window(filename, req_vars, tlim, jd=True, full=True)
+	if d is None: return None
 	misc.require_vars(d, req_vars)
 	dx = {}
 	misc.populate_meta(dx, META, set(vars) & set(VARS))
@@ -62,8 +55,7 @@ def read(
 	if 'backscatter' in vars:
 		dx['backscatter'] = d['beta_raw']*1e-11*p['calibration_coeff']
 	if 'zfull' in vars:
-		zfull1 = d['range'] + dx['altitude'][0]
-		dx['zfull'] = np.tile(zfull1, (n, 1))
+		misc.set_zfull(dx, d['range'], np.full(n, dx['altitude'][0]))
 	for var in keep_vars:
 		misc.keep_var(var, d, dx)
 	return dx
@@ -22,29 +22,8 @@ def params(type_):
 		'max_range': 15400, # m
 	}
 
-def read(
-	type_,
-	filename,
-	vars,
-	altitude=None,
-	tlim=None,
-	keep_vars=[],
-	**kwargs
-):
+def convert(type_, d, vars, time_bnds, altitude=None, keep_vars=[]):
 	p = params(type_)
-	sel = None
-	if tlim is not None:
-		d = ds.read(filename, 'time', jd=True)
-		misc.require_vars(d, ['time'])
-		d['time_bnds'] = misc.time_bnds(d['time'])
-		mask = misc.time_mask(d['time_bnds'], tlim[0], tlim[1])
-		if np.sum(mask) == 0: return None
-		sel = {'time': mask}
-
-	dep_vars = misc.dep_vars(VARS, vars)
-	req_vars = dep_vars + DEFAULT_VARS + keep_vars
-	d = ds.read(filename, req_vars, sel=sel, full=True)
-	misc.require_vars(d, req_vars)
 	dx = {}
 	misc.populate_meta(dx, META, set(vars) & set(VARS))
 	n = len(d['time'])
@@ -52,8 +31,7 @@ def read(
 	if 'time' in vars:
 		dx['time'] = d['time']
 	if 'time_bnds' in vars:
-		args = [] if tlim is None else [tlim[0], tlim[1]]
-		dx['time_bnds'] = misc.time_bnds(d['time'], None, *args)
+		dx['time_bnds'] = time_bnds
 	if 'altitude' in vars or 'zfull' in vars:
 		if altitude is not None:
 			dx['altitude'] = np.full(n, altitude, np.float64)
@@ -63,10 +41,65 @@ def read(
 			else:
 				dx['altitude'] = d['elevation']
 	if 'zfull' in vars:
-		dx['zfull'] = np.tile(d['range'], (n, 1))
-		dx['zfull'] = (dx['zfull'].T + dx['altitude']).T
+		misc.set_zfull(dx, d['range'], dx['altitude'])
 	if 'backscatter' in vars:
 		dx['backscatter'] = d['beta_att']*p['calibration_coeff']
 	for var in keep_vars:
 		misc.keep_var(var, d, dx, {'time': 'profile', 'level': 'range'})
 	return dx
+
+def calc_time_bnds(time, tlim):
+	args = [] if tlim is None else [tlim[0], tlim[1]]
+	return misc.time_bnds(time/86400. + 2440587.5, None, *args)
+
+def read(
+	type_,
+	filename,
+	vars,
+	altitude=None,
+	tlim=None,
+	keep_vars=[],
+	**kwargs
+):
+	dep_vars = misc.dep_vars(VARS, vars)
+	req_vars = dep_vars + DEFAULT_VARS + keep_vars
+	d = misc.read_window(filename, req_vars, tlim, full=True)
+	if d is None: return None
+	misc.require_vars(d, req_vars)
+	bnds = calc_time_bnds(d['time'], tlim) if 'time_bnds' in vars else None
+	return convert(type_, d, vars, bnds,
+		altitude=altitude,
+		keep_vars=keep_vars,
+	)
+
+def read_blocks(
+	type_,
+	filename,
+	vars,
+	block,
+	altitude=None,
+	tlim=None,
+	keep_vars=[],
+	**kwargs
+):
+	# Like read, but yield blocks of at most block profiles. Time bounds are
+	# calculated from the time of all profiles so that they are the same as
+	# with read.
+	dep_vars = misc.dep_vars(VARS, vars)
+	req_vars = dep_vars + DEFAULT_VARS + keep_vars
+	bnds = None
+	if 'time_bnds' in vars:
+		d = misc.read_window(filename, ['time'], tlim, full=True)
+		if d is None: return
+		misc.require_vars(d, ['time'])
+		bnds = calc_time_bnds(d['time'], tlim)
+	i = 0
+	for d in misc.read_blocks(filename, req_vars, block, tlim, full=True):
+		misc.require_vars(d, req_vars)
+		n = len(d['time'])
+		yield convert(type_, d, vars,
+			bnds[i:(i + n)] if bnds is not None else None,
+			altitude=altitude,
+			keep_vars=keep_vars,
+		)
+		i += n
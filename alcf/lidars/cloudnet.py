@@ -32,18 +32,11 @@ def read(type_, filename, vars,
 	**kwargs
 ):
 	p = params(type_)
-	sel = None
-	if tlim is not None:
-		d = ds.read(filename, 'time', jd=True)
-		misc.require_vars(d, ['time'])
-		d['time_bnds'] = misc.time_bnds(d['time'])
-		mask = misc.time_mask(d['time_bnds'], tlim[0], tlim[1])
-		if np.sum(mask) == 0: return None
-		sel = {'time': mask}
 
 	dep_vars = misc.dep_vars(VARS, vars)
 	req_vars = dep_vars + DEFAULT_VARS + keep_vars
-	d = ds.read(filename, req_vars, jd=True, sel=sel, full=True)
+	d = misc.read_window(filename, req_vars, tlim, jd=True, full=True)
+	if d is None: return None
 	misc.require_vars(d, req_vars)
 	dx = {}
 	misc.populate_meta(dx, META, set(vars) & set(VARS))
@@ -59,7 +52,7 @@ def read(type_, filename, vars,
 		else:
 			dx['altitude'] = np.full(n, d['altitude'], np.float64)
 	if 'zfull' in vars:
-		dx['zfull'] = np.tile(d['height'], (n, 1))
+		misc.set_zfull(dx, d['height'])
 	if 'backscatter' in vars:
 		dx['backscatter'] = d['beta_raw']*p['calibration_coeff']
 	for var in keep_vars:
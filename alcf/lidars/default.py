@@ -17,17 +17,13 @@ def read(type_, filename, vars,
 	keep_vars=[],
 	**kwargs
 ):
-	sel = None
 	keep_vars_prefixed = ['input_' + var for var in keep_vars]
 	req_vars = vars + keep_vars_prefixed
-	if time is not None:
-		d = ds.read(filename, 'time_bnds', jd=True)
-		mask = misc.time_mask(d['time_bnds'], time[0], time[1])
-		if np.sum(mask) == 0: return None
-		sel = {'time': mask}
-
-	d = ds.read(filename, req_vars, sel=sel)
-	n = d['backscatter'].shape[0]
+	d = misc.read_window(filename, req_vars, time,
+		time_vars=['time_bnds'],
+		time_bnds_f=lambda d: d['time_bnds'],
+	)
+	if d is None: return None
 	dx = {}
 	for var in vars:
 		if var in ds.vars(d):
@@ -28,6 +28,8 @@ DEFAULT_VARS = TIME_VARS + [
 	'longitude',
 ]
 
+WARNING = 'WARNING: valid_range not used since it\ncannot be safely cast to variable data type'
+
 def parse_temporal_resolution(s):
 	errmsg = 'Unrecognized temporal resolution "%s"' % s
 	x = s.split(' ')
@@ -70,34 +72,8 @@ def params(type_):
 		'max_range': 30000, # m
 	}
 
-def read(
-	type_,
-	filename,
-	vars,
-	altitude=None,
-	lon=None,
-	lat=None,
-	tlim=None,
-	keep_vars=[],
-	**kwargs
-):
+def convert(type_, d, vars, time, time_bnds, altitude=None, keep_vars=[]):
 	p = params(type_)
-	sel = None
-	tres = None
-	if tlim is not None:
-		d = ds.read(filename, TIME_VARS)
-		misc.require_vars(d, ['time'])
-		d['time'], d['time_bnds'], tres = convert_time(d)
-		mask = misc.time_mask(d['time_bnds'], tlim[0], tlim[1])
-		if np.sum(mask) == 0: return None
-		sel = {'time': mask}
-
-	dep_vars = misc.dep_vars(VARS, vars)
-	req_vars = dep_vars + DEFAULT_VARS + keep_vars
-	with warnings.catch_warnings():
-		warnings.filterwarnings('ignore', message='WARNING: valid_range not used since it\ncannot be safely cast to variable data type')
-		d = ds.read(filename, req_vars, sel=sel, full=True)
-	misc.require_vars(d, req_vars)
 	dx = {}
 	misc.populate_meta(dx, META, set(vars) & set(VARS))
 	n = ds.dim(d, 'time')
@@ -106,20 +82,15 @@ def read(
 			dx['altitude'] = np.full(n, altitude, np.float64)
 		else:
 			dx['altitude'] = d['altitude']
-	time, time_bnds, tres = convert_time(d, tlim)
 	if 'time' in vars:
 		dx['time'] = time
 		# dx['time'] += 13.0/24.0
 	if 'time_bnds' in vars:
 		dx['time_bnds'] = time_bnds
 	if 'zfull' in vars:
-		zfull1 = np.outer(
-			np.sin(d['elevation_angle']/180.0*np.pi),
-			d['range_nrb']*1e3
-		)
-		dx['zfull'] = np.tile(zfull1, (n, 1))
-		for i in range(n):
-			dx['zfull'][i,:] += dx['altitude'][i]
+		range_ = np.sin(d['elevation_angle']/180.0*np.pi)[...,np.newaxis]*\
+			(d['range_nrb']*1e3)
+		misc.set_zfull(dx, range_, dx['altitude'], range_.dtype)
 	if 'backscatter' in vars:
 		dx['backscatter'] = (d['copol_nrb'] + 2.*d['crosspol_nrb'])*p['calibration_coeff']
 	if 'lon' in vars:
@@ -143,3 +114,78 @@ def read(
 	for var in keep_vars:
 		misc.keep_var(var, d, dx, {'level': 'range_nrb'})
 	return dx
+
+def read_nc(filename, req_vars, tlim, block=None):
+	# Read the required variables of all profiles (block None) or a
+	# generator of blocks of profiles.
+	kwargs = dict(
+		time_vars=TIME_VARS,
+		time_bnds_f=lambda d: convert_time(d, None)[1],
+		time_jd=False,
+		full=True,
+	)
+	if block is None:
+		return misc.read_window(filename, req_vars, tlim, **kwargs)
+	return misc.read_blocks(filename, req_vars, block, tlim, **kwargs)
+
+def read(
+	type_,
+	filename,
+	vars,
+	altitude=None,
+	lon=None,
+	lat=None,
+	tlim=None,
+	keep_vars=[],
+	**kwargs
+):
+	dep_vars = misc.dep_vars(VARS, vars)
+	req_vars = dep_vars + DEFAULT_VARS + keep_vars
+	with warnings.catch_warnings():
+		warnings.filterwarnings('ignore', message=WARNING)
+		d = read_nc(filename, req_vars, tlim)
+	if d is None: return None
+	misc.require_vars(d, req_vars)
+	time, time_bnds, tres = convert_time(d, tlim)
+	return convert(type_, d, vars, time, time_bnds,
+		altitude=altitude,
+		keep_vars=keep_vars,
+	)
+
+def read_blocks(
+	type_,
+	filename,
+	vars,
+	block,
+	altitude=None,
+	lon=None,
+	lat=None,
+	tlim=None,
+	keep_vars=[],
+	**kwargs
+):
+	# Like read, but yield blocks of at most block profiles. Time and time
+	# bounds are calculated from the time of all profiles so that they are
+	# the same as with read.
+	dep_vars = misc.dep_vars(VARS, vars)
+	req_vars = dep_vars + DEFAULT_VARS + keep_vars
+	with warnings.catch_warnings():
+		warnings.filterwarnings('ignore', message=WARNING)
+		d = read_nc(filename, TIME_VARS, tlim)
+	if d is None: return
+	misc.require_vars(d, TIME_VARS)
+	time, time_bnds, tres = convert_time(d, tlim)
+	blocks = read_nc(filename, req_vars, tlim, block)
+	i = 0
+	while True:
+		with warnings.catch_warnings():
+			warnings.filterwarnings('ignore', message=WARNING)
+			d = next(blocks, None)
+		if d is None: break
+		misc.require_vars(d, req_vars)
+		n = ds.dim(d, 'time')
+		yield convert(type_, d, vars, time[i:(i + n)], time_bnds[i:(i + n)],
+			altitude=altitude,
+			keep_vars=keep_vars,
+		)
+		i += n
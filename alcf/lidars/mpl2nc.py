@@ -38,18 +38,12 @@ def read(
 	**kwargs
 ):
 	p = params(type_)
-	sel = None
-	if tlim is not None:
-		d = ds.read(filename, 'time', jd=True)
-		misc.require_vars(d, ['time'])
-		d['time_bnds'] = misc.time_bnds(d['time'])
-		mask = misc.time_mask(d['time_bnds'], tlim[0], tlim[1])
-		if np.sum(mask) == 0: return None
-		sel = {'profile': mask}
 
 	dep_vars = misc.dep_vars(VARS, vars)
 	req_vars = dep_vars + DEFAULT_VARS + keep_vars
-	d = ds.read(filename, req_vars, jd=True, sel=sel, full=True)
+	d = misc.read_window(filename, req_vars, tlim, dim='profile', jd=True,
+		full=True)
+	if d is None: return None
 	misc.require_vars(d, req_vars)
 	mask = d['elevation_angle'] == 0.0
 	dx = {}
@@ -68,11 +62,9 @@ def read(
 		args = [] if tlim is None else [tlim[0], tlim[1]]
 		dx['time_bnds'] = misc.time_bnds(d['time'], None, *args)
 	if 'zfull' in vars:
-		dx['zfull'] = np.full((n, m), np.nan, np.float64)
-		for i in range(n):
-			range_ = 0.5*d['bin_time'][i]*d['c']*(np.arange(m) + 0.5)
-			dx['zfull'][i,:] = range_*np.sin(d['elevation_angle'][i]/180.0*np.pi)
-			dx['zfull'][i,:] += altitude[i]
+		range_ = 0.5*d['bin_time'][:,np.newaxis]*d['c']*(np.arange(m) + 0.5)
+		range_ = range_*np.sin(d['elevation_angle']/180.0*np.pi)[:,np.newaxis]
+		misc.set_zfull(dx, range_.astype(np.float64), altitude)
 	if 'backscatter' in vars:
 		dx['backscatter'] = (d['nrb_copol'] + 2.*d['nrb_crosspol'])*p['calibration_coeff']
 	if 'altitude' in vars:
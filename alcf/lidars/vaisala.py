@@ -51,19 +51,12 @@ def read(type_, filename, vars,
 	**kwargs
 ):
 	p = params(type_)
-	sel = None
-	if tlim is not None:
-		d = ds.read(filename, 'time', jd=True)
-		misc.require_vars(d, ['time'])
-		d['time_bnds'] = misc.time_bnds(d['time'])
-		mask = misc.time_mask(d['time_bnds'], tlim[0], tlim[1])
-		if np.sum(mask) == 0: return None
-		sel = {'time': mask}
 
 	dep_vars = misc.dep_vars(VARS, vars)
 	req_vars = dep_vars + DEFAULT_VARS1 + keep_vars
 	vars_ = req_vars + DEFAULT_VARS2
-	d = ds.read(filename, vars_, jd=True, sel=sel, full=True)
+	d = misc.read_window(filename, vars_, tlim, jd=True, full=True)
+	if d is None: return None
 	misc.require_vars(d, req_vars)
 	dx = {}
 	misc.populate_meta(dx, META, set(vars) & set(VARS))
@@ -80,10 +73,8 @@ def read(type_, filename, vars,
 	else:
 		raise ValueError('Variable "range" or "level" and "vertical_resolution" is required')
 	if 'zfull' in vars:
-		zfull1 = range_
-		dx['zfull'] = np.tile(zfull1, (n, 1))
-		if altitude is not None:
-			dx['zfull'] += altitude
+		misc.set_zfull(dx, range_,
+			np.full(n, altitude) if altitude is not None else None)
 	if 'backscatter' in vars:
 		factor = 1e-4 if (d['.']['backscatter']['units'] == '1/(sr*km*10000)') \
 			else 1 # Factor of 1e-4 if ARM CL51 format.
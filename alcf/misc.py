@@ -1,10 +1,14 @@
+import os
+import io
+import glob
+import json
+import hashlib
 import logging
 import copy
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 from fractions import Fraction
 import numpy as np
-import astropy.coordinates
-import astropy.time
-import astropy.units
 import ds_format as ds
 import aquarius_time as aq
 
@@ -23,7 +27,78 @@ def parse_time(time):
 		raise ValueError('Invalid time: %s' % time)
 	return [start, end]
 
+def period_index(t, period, epsilon=1./86400.):
+	return np.floor((t + 0.5 + epsilon)/period)
+
+def period_start(t, period, epsilon=1./86400.):
+	# Computed from the period index so that the result does not depend on
+	# where in the period t falls.
+	return period_index(t, period, epsilon)*period - 0.5
+
+def aggregate_view(d, i1, i2):
+	# View of profiles i1 to i2 of dataset d. The variables with a time
+	# dimension are masked arrays like the output of ds.merge.
+	dx = {}
+	for var in ds.vars(d):
+		dims = ds.dims(d, var)
+		if 'time' in dims:
+			i = dims.index('time')
+			dx[var] = np.ma.asarray(d[var][(slice(None),)*i + (slice(i1, i2),)])
+		else:
+			dx[var] = d[var]
+	dx['.'] = d['.']
+	return dx
+
+def aggregate_merge(dd):
+	# Merge datasets dd along time like ds.merge. A single dataset is not
+	# copied, only its metadata. Variables without a time dimension which
+	# differ between the datasets, such as a time-invariant zfull of
+	# profiles with a different altitude, are repeated for every profile.
+	for var in ds.vars(dd[0]):
+		has_time = [var in d and 'time' in ds.dims(d, var) for d in dd]
+		if all(has_time) or not any(has_time) and all(
+			var in d and np.array_equal(d[var], dd[0][var])
+			for d in dd[1:]
+		):
+			continue
+		dd = [d if var not in d or 'time' in ds.dims(d, var) else
+			expand_time(d, var) for d in dd]
+	if any(set(ds.vars(d)) != set(ds.vars(dd[0])) for d in dd[1:]):
+		return ds.merge(dd, 'time')
+	dx = {'.': copy.deepcopy(dd[0]['.'])}
+	for d in dd[1:]:
+		for var, meta in d['.'].items():
+			dx['.'].setdefault(var, {}).update(copy.deepcopy(meta))
+	for var in ds.vars(dd[0]):
+		dims = ds.dims(dd[0], var)
+		if len(dd) == 1 or 'time' not in dims:
+			dx[var] = dd[0][var]
+			continue
+		i = dims.index('time')
+		dx[var] = np.ma.concatenate([d[var] for d in dd], axis=i)
+	return dx
+
+def aggregate_next(time_bnds, i, t2, epsilon, is_sorted):
+	# Index of the first profile from i ending after t2, or None.
+	end = time_bnds[:,1]
+	n = len(end)
+	if is_sorted:
+		j = max(i, np.searchsorted(end, t2 + epsilon, side='right'))
+		while j > i and end[j-1] - t2 > epsilon:
+			j -= 1
+		while j < n and not (end[j] - t2 > epsilon):
+			j += 1
+		return j if j < n else None
+	mask = end[i:] - t2 > epsilon
+	return i + np.argmax(mask) if np.any(mask) else None
+
 def aggregate(dd, state, period, epsilon=1./86400., align=True):
+	# Split and merge datasets dd into periods. The datasets of periods which
+	# lie within one input dataset are views of the input dataset, and are
+	# only concatenated if a period spans multiple input datasets. Profiles
+	# on a period boundary are shared by the adjacent periods. Functions
+	# which process the output should therefore not modify the data in
+	# place.
 	dd = state.get('dd', []) + dd
 	state['dd'] = []
 
@@ -32,7 +107,8 @@ def aggregate(dd, state, period, epsilon=1./86400., align=True):
 
 	def merge(dd, t1, t2):
 		if len(ddb) > 0:
-			dx = ds.merge(ddb, 'time')
+			dx = aggregate_merge(ddb)
+			dx['time_bnds'] = dx['time_bnds'].copy()
 			dx['time_bnds'][0,0] = max(t1, dx['time_bnds'][0,0])
 			dx['time_bnds'][-1,1] = min(t2, dx['time_bnds'][-1,1])
 			if dx['time_bnds'][-1,1] > dx['time_bnds'][0,0]:
@@ -43,41 +119,39 @@ def aggregate(dd, state, period, epsilon=1./86400., align=True):
 	ddb = []
 	t = dd[0]['time_bnds'][0,0]
 	if align:
-		r = (t + 0.5 + epsilon) % period
-		t1 = state.get('t1', t - r + epsilon)
+		t1 = state.get('t1', period_start(t, period, epsilon))
+		t2 = state.get('t2', period_start(t1 + period, period, epsilon))
 	else:
 		t1 = state.get('t1', t)
-	t2 = state.get('t2', t1 + period)
+		t2 = state.get('t2', t1 + period)
 	for d in dd:
 		if d is None:
 			ddo += merge(ddb, t1, t2) + [None]
 			break
+		time_bnds = d['time_bnds']
+		n = len(d['time'])
+		is_sorted = bool(np.all(np.diff(time_bnds[:,1]) >= 0))
 		i1 = 0
 		i = 0
-		while i < len(d['time']):
-			if not (d['time_bnds'][i,1] - t2 > epsilon):
-				i += 1
-				continue
-			ii = np.arange(i1, i + (t2 - d['time_bnds'][i,0] > epsilon))
-			if len(ii) > 0:
-				dx = copy.copy(d)
-				ds.select(dx, {'time': ii})
-				ddb += [dx]
+		while True:
+			i = aggregate_next(time_bnds, i, t2, epsilon, is_sorted)
+			if i is None:
+				break
+			i2 = i + (t2 - time_bnds[i,0] > epsilon)
+			if i2 > i1:
+				ddb += [aggregate_view(d, i1, i2)]
 			ddo += merge(ddb, t1, t2)
 			i1 = i
-			t = d['time_bnds'][i,0]
+			t = time_bnds[i,0]
 			if align:
-				r = (t + 0.5 + epsilon) % period
-				t1 = max(t2, t - r + epsilon)
+				t1 = max(t2, period_start(t, period, epsilon))
+				t2 = period_start(t1 + period, period, epsilon)
 			else:
 				t1 = max(t2, t)
-			t2 = t1 + period
+				t2 = t1 + period
 			ddb = []
-		ii = np.arange(i1, len(d['time']))
-		if len(ii) > 0:
-			dx = copy.copy(d)
-			ds.select(dx, {'time': ii})
-			ddb += [dx]
+		if n > i1:
+			ddb += [aggregate_view(d, i1, n)]
 	state['dd'] = ddb
 	state['t1'] = t1
 	state['t2'] = t2
@@ -94,10 +168,12 @@ def stream(dd, state, f, **options):
 	return dd[:(i+1)]
 
 def half(xfull):
-	xhalf = np.zeros(len(xfull) + 1, dtype=xfull.dtype)
-	xhalf[1:-1] = 0.5*(xfull[1:] + xfull[:-1])
-	xhalf[0] = 2.*xfull[0] - xfull[1]
-	xhalf[-1] = 2.*xfull[-1] - xfull[-2]
+	shape = list(xfull.shape)
+	shape[-1] += 1
+	xhalf = np.zeros(shape, dtype=xfull.dtype)
+	xhalf[...,1:-1] = 0.5*(xfull[...,1:] + xfull[...,:-1])
+	xhalf[...,0] = 2.*xfull[...,0] - xfull[...,1]
+	xhalf[...,-1] = 2.*xfull[...,-1] - xfull[...,-2]
 	return xhalf
 
 def full(xhalf):
@@ -120,7 +196,10 @@ def time_bnds(time, step=None, start=None, end=None):
 		bnds[-1,1] = min(bnds[-1,1], end)
 	return bnds
 
-def sun_altitude(t, lon, lat):
+def sun_altitude_astropy(t, lon, lat):
+	import astropy.coordinates
+	import astropy.time
+	import astropy.units
 	loc = astropy.coordinates.EarthLocation(
 		lon=lon*astropy.units.deg,
 		lat=lat*astropy.units.deg
@@ -130,6 +209,55 @@ def sun_altitude(t, lon, lat):
 	sun = astropy.coordinates.get_sun(time)
 	return sun.transform_to(altaz).alt.hour/24.*360.
 
+def sun_altitude_noaa(t, lon, lat):
+	# Solar position algorithm of the NOAA Global Monitoring Laboratory
+	# solar calculator (based on Meeus, 1991), without atmospheric
+	# refraction. Accurate to about 0.01 degrees between 1800 and 2100.
+	t = np.asarray(t, np.float64)
+	lon = np.asarray(lon, np.float64)
+	lat = np.radians(np.asarray(lat, np.float64))
+	jc = (t - 2451545.)/36525.
+	l0 = np.radians((280.46646 + jc*(36000.76983 + jc*0.0003032)) % 360.)
+	m = np.radians(357.52911 + jc*(35999.05029 - 0.0001537*jc))
+	e = 0.016708634 - jc*(0.000042037 + 0.0000001267*jc)
+	c = np.radians(
+		np.sin(m)*(1.914602 - jc*(0.004817 + 0.000014*jc)) +
+		np.sin(2*m)*(0.019993 - 0.000101*jc) +
+		np.sin(3*m)*0.000289
+	)
+	omega = np.radians(125.04 - 1934.136*jc)
+	app_long = l0 + c - np.radians(0.00569 + 0.00478*np.sin(omega))
+	obliq = np.radians(23. + (26. + (21.448 - jc*(46.815 + jc*(0.00059 -
+		jc*0.001813)))/60.)/60. + 0.00256*np.cos(omega))
+	decl = np.arcsin(np.sin(obliq)*np.sin(app_long))
+	y = np.tan(obliq/2)**2
+	eq_time = 4*np.degrees(
+		y*np.sin(2*l0) -
+		2*e*np.sin(m) +
+		4*e*y*np.sin(m)*np.cos(2*l0) -
+		0.5*y**2*np.sin(4*l0) -
+		1.25*e**2*np.sin(2*m)
+	)
+	true_solar_time = (((t + 0.5) % 1.)*1440. + eq_time + 4*lon) % 1440.
+	hour_angle = np.radians(true_solar_time/4. - 180.)
+	x = np.sin(lat)*np.sin(decl) + np.cos(lat)*np.cos(decl)*np.cos(hour_angle)
+	return 90. - np.degrees(np.arccos(np.clip(x, -1, 1)))
+
+SUN_ALTITUDE = {
+	'astropy': sun_altitude_astropy,
+	'noaa': sun_altitude_noaa,
+}
+
+def sun_altitude(t, lon, lat, method='noaa'):
+	'''Return the solar altitude (degrees) at time t (Julian date) and
+	longitude lon and latitude lat (degrees). method is "noaa" for the NOAA
+	solar calculator algorithm or "astropy" for the slower reference
+	calculation with astropy.'''
+	try: f = SUN_ALTITUDE[method]
+	except KeyError:
+		raise ValueError('Invalid solar altitude method "%s"' % method)
+	return f(t, lon, lat)
+
 def require_vars(d, variables):
 	for v in variables:
 		if v not in d:
@@ -149,20 +277,246 @@ def geo_distance(lon1, lat1, lon2, lat2, method='gc'):
 	else:
 		raise ValueError('Unrecognized method "%s"' % method)
 
+def geo_xyz(lon, lat):
+	lon, lat = [np.asarray(x, np.float64)/180*np.pi for x in (lon, lat)]
+	return np.stack([
+		np.cos(lat)*np.cos(lon),
+		np.cos(lat)*np.sin(lon),
+		np.sin(lat),
+	], axis=-1)
+
+def geo_index(lon, lat):
+	# Chord distance on the unit sphere is monotonic in great-circle distance,
+	# so the nearest point in Cartesian coordinates is also the nearest
+	# point on the sphere.
+	import scipy.spatial
+	return scipy.spatial.cKDTree(geo_xyz(lon, lat))
+
+def geo_nearest(index, lon, lat):
+	_, i = index.query(geo_xyz(lon, lat))
+	return i
+
+READ_POINTS_MAX_BLOCK = 4096
+
+def read_points_block(sel, ii):
+	# Number of combinations of unique indices read for the points ii.
+	# Identical index arrays (alternative names of the same dimension) are
+	# counted only once.
+	n = 1
+	seen = []
+	for v in sel.values():
+		v = v[ii]
+		if any(np.array_equal(v, w) for w in seen):
+			continue
+		seen += [v]
+		n *= len(np.unique(v))
+	return n
+
+def read_points_groups(sel, ii, max_block):
+	if len(ii) <= 1 or read_points_block(sel, ii) <= max_block:
+		return [ii]
+	m = len(ii)//2
+	return read_points_groups(sel, ii[:m], max_block) + \
+		read_points_groups(sel, ii[m:], max_block)
+
+def read_points(filename, variables, sel, dim='time',
+	max_block=READ_POINTS_MAX_BLOCK, **kwargs):
+	'''Read values at a sequence of points from a file. sel is a dictionary
+	of dimension names and arrays of indices (one per point) or single
+	indices. The file is read with a single ds.read call of the block
+	spanned by the unique indices of the points, split into consecutive
+	groups of points if the block has more than max_block combinations of
+	indices. The dimensions indexed by arrays are replaced with a new
+	leading dimension dim along the points.'''
+	point_sel = {k: np.asarray(v) for k, v in sel.items() if np.ndim(v) == 1}
+	fixed_sel = {k: v for k, v in sel.items() if np.ndim(v) == 0}
+	n = len(next(iter(point_sel.values())))
+	dd = []
+	for ii in read_points_groups(point_sel, np.arange(n), max_block):
+		inv = {}
+		sel1 = dict(fixed_sel)
+		for k, v in point_sel.items():
+			u, inv[k] = np.unique(v[ii], return_inverse=True)
+			sel1[k] = list(u)
+		d = ds.read(filename, variables, sel=sel1, **kwargs)
+		for var in ds.vars(d):
+			dims = ds.dims(d, var)
+			axes = [i for i, x in enumerate(dims) if x in point_sel]
+			if len(axes) == 0:
+				continue
+			x = np.moveaxis(d[var], axes, range(len(axes)))
+			d[var] = x[tuple([inv[dims[i]] for i in axes])]
+			ds.dims(d, var, [dim] + [x for x in dims if x not in point_sel])
+			d['.'][var].pop('.size', None)
+		dd += [d]
+	return dd[0] if len(dd) == 1 else ds.merge(dd, dim)
+
 def time_mask(bnds, t1, t2):
 	return ~(((bnds[:,0] < t1) & (bnds[:,1] < t1)) |
 	         ((bnds[:,0] > t2) & (bnds[:,1] > t2)))
 
-def track_at(d, t, epsilon=1/86400):
-	i = np.searchsorted(d['time_bnds'][:,0], t, side='right')
-	if i == 0:
-		if t >= d['time_bnds'][0,0] - epsilon:
-			return d['lon'][0], d['lat'][0]
+time_extent_cache = {}
+
+def read_nc_window(f, variables, dim, s, full):
+	# Read variables from an open NetCDF file f with the records s (a slice
+	# or an array of indices) of dimension dim.
+	from ds_format.drivers import netcdf
+	d = {}
+	ds.attrs(d, None, netcdf.read_attrs(f))
+	for var in f.variables.keys():
+		if variables is not None and var not in variables:
+			if full:
+				_, var_meta = netcdf.read_var(f, var, None, False)
+				ds.meta(d, var, var_meta)
+			continue
+		dims = f[var].dimensions
+		if dim in dims:
+			_, var_meta = netcdf.read_var(f, var, None, False)
+			ds.var(d, var, f[var][tuple([
+				s if x == dim else slice(None)
+				for x in dims
+			])])
+		else:
+			data, var_meta = netcdf.read_var(f, var)
+			ds.var(d, var, data)
+		ds.meta(d, var, var_meta)
+	return d
+
+def window_skip(filename, key, tlim):
+	# Check if the cached time extent of a file shows that it does not
+	# overlap with time limits tlim.
+	extent = time_extent_cache.get(filename)
+	return extent is not None and extent[0] == key and (
+		extent[1] is None or
+		extent[1][1] < tlim[0] or
+		extent[1][0] > tlim[1]
+	)
+
+def window_records(filename, key, d, tlim, time_vars, time_bnds_f):
+	# Indices of the records of a file overlapping with time limits tlim,
+	# determined from a dataset d of time_vars of the file. The time extent
+	# of the file is cached.
+	if time_bnds_f is None:
+		time_bnds_f = lambda d: time_bnds(d['time'])
+	require_vars(d, time_vars)
+	bnds = time_bnds_f(d)
+	time_extent_cache[filename] = (key, [
+		np.amin(bnds[:,0]),
+		np.amax(bnds[:,1]),
+	] if len(bnds) > 0 else None)
+	return np.nonzero(time_mask(bnds, tlim[0], tlim[1]))[0]
+
+def records_sel(ii):
+	# Selector of records ii, which is a slice if they are contiguous.
+	if ii[-1] - ii[0] + 1 == len(ii):
+		return slice(ii[0], ii[-1] + 1)
+	return ii
+
+def read_window(filename, variables, tlim=None, dim='time',
+	time_vars=['time'], time_bnds_f=None, time_jd=True, jd=False,
+	full=False):
+	'''Read variables from a file like ds.read, but only the records of
+	dimension dim which overlap with time limits tlim. time_bnds_f is a
+	function of a dataset containing time_vars, which returns the time
+	bounds of the records. If time_jd is true, time_vars are converted to
+	Julian date before. NetCDF files are opened only once, and the
+	selected records are read as a contiguous range if possible. The time
+	extent of the file is cached, and files which do not overlap with tlim
+	are skipped without opening them if read again. Returns None if no
+	records overlap with tlim.'''
+	if tlim is None:
+		return ds.read(filename, variables, jd=jd, full=full)
+	try: key = index_key(filename)
+	except OSError: key = None
+	if window_skip(filename, key, tlim):
+		return None
+
+	from ds_format.drivers import netcdf
+	from ds_format import misc as ds_misc
+	if not filename.endswith(tuple('.' + x for x in netcdf.READ_EXT)):
+		d = ds.read(filename, time_vars, jd=time_jd, full=True)
+		f = None
+	else:
+		from netCDF4 import Dataset
+		f = Dataset(filename, 'r')
+	try:
+		if f is not None:
+			d = read_nc_window(f, time_vars, dim, slice(None), True)
+			if time_jd:
+				for var in ds.vars(d):
+					ds_misc.process_cf_time_var(d, var)
+		ii = window_records(filename, key, d, tlim, time_vars, time_bnds_f)
+		if len(ii) == 0:
+			return None
+		if f is None:
+			return ds.read(filename, variables, sel={dim: ii}, jd=jd,
+				full=full)
+		d = read_nc_window(f, variables, dim, records_sel(ii), full)
+	finally:
+		if f is not None:
+			f.close()
+	if jd:
+		for var in ds.vars(d):
+			ds_misc.process_cf_time_var(d, var)
+	return d
+
+def read_blocks(filename, variables, block=None, tlim=None, dim='time',
+	time_vars=['time'], time_bnds_f=None, time_jd=True, jd=False,
+	full=False):
+	'''Read variables from a file like read_window, but yield the selected
+	records of dimension dim in blocks of at most block records, so that
+	only one block is in memory at a time. NetCDF files are kept open until
+	the last block is read. Other file formats and block None yield all
+	records as a single block. Nothing is yielded if no records overlap
+	with tlim.'''
+	from ds_format.drivers import netcdf
+	from ds_format import misc as ds_misc
+	if block is None or \
+		not filename.endswith(tuple('.' + x for x in netcdf.READ_EXT)):
+		d = read_window(filename, variables, tlim, dim, time_vars,
+			time_bnds_f, time_jd, jd, full)
+		if d is not None:
+			yield d
+		return
+	try: key = index_key(filename)
+	except OSError: key = None
+	if tlim is not None and window_skip(filename, key, tlim):
+		return
+	from netCDF4 import Dataset
+	with Dataset(filename, 'r') as f:
+		if tlim is None:
+			ii = np.arange(f.dimensions[dim].size)
 		else:
-			return np.nan, np.nan
-	if t <= d['time_bnds'][i-1,1] + epsilon:
-		return d['lon'][i-1], d['lat'][i-1]
-	return np.nan, np.nan
+			d = read_nc_window(f, time_vars, dim, slice(None), True)
+			if time_jd:
+				for var in ds.vars(d):
+					ds_misc.process_cf_time_var(d, var)
+			ii = window_records(filename, key, d, tlim, time_vars,
+				time_bnds_f)
+		for i in range(0, len(ii), block):
+			d = read_nc_window(f, variables, dim, records_sel(ii[i:i + block]),
+				full)
+			if jd:
+				for var in ds.vars(d):
+					ds_misc.process_cf_time_var(d, var)
+			yield d
+
+def track_at(d, t, epsilon=1/86400):
+	# Return longitude and latitude of track d at time t. t can be a scalar
+	# or an array. Times outside of the track segments are NaN.
+	t = np.asarray(t, np.float64)
+	time_bnds = d['time_bnds']
+	i = np.searchsorted(time_bnds[:,0], t, side='right')
+	j = np.maximum(i - 1, 0)
+	mask = np.where(i == 0,
+		t >= time_bnds[0,0] - epsilon,
+		t <= time_bnds[j,1] + epsilon
+	)
+	lon = np.where(mask, d['lon'][j], np.nan)
+	lat = np.where(mask, d['lat'][j], np.nan)
+	if t.ndim == 0:
+		return lon[()], lat[()]
+	return lon, lat
 
 def populate_meta(d, meta, vars):
 	d_tmp = {'.': meta}
@@ -170,6 +524,45 @@ def populate_meta(d, meta, vars):
 		ds.meta(d, var, ds.meta(d_tmp, var))
 	ds.meta(d, None, ds.meta(d_tmp))
 
+def set_zfull(d, range_, altitude=None, dtype=None):
+	'''Set the height of full levels zfull in dataset d from range range_
+	(level) or (time, level) and instrument altitude (time) or None for
+	zero. zfull is kept as a 1-D array (level) if the range and altitude
+	are the same for all profiles, and is a 2-D array (time, level)
+	otherwise. dtype is the type of zfull or None for the type of the
+	sum.'''
+	if range_.ndim == 2 and len(range_) > 0 and np.all(range_ == range_[0]):
+		range_ = range_[0]
+	if altitude is None:
+		zfull = range_
+	elif range_.ndim == 1 and len(altitude) > 0 and \
+		np.all(altitude == altitude[0]):
+		zfull = range_ + altitude[:1]
+	else:
+		n = len(altitude)
+		zfull = (np.broadcast_to(range_, (n, range_.shape[-1])).T +
+			altitude).T
+	if dtype is not None:
+		zfull = zfull.astype(dtype, copy=False)
+	d['zfull'] = zfull
+	# The metadata can be shared with other datasets (see populate_meta).
+	d['.'] = dict(d['.'])
+	d['.']['zfull'] = dict(d['.'].get('zfull', {}),
+		**{'.dims': ['level'] if zfull.ndim == 1 else ['time', 'level']}
+	)
+
+def expand_time(d, var):
+	# Dataset d with variable var without a time dimension repeated for
+	# every profile. The dataset is not modified.
+	n = ds.dim(d, 'time')
+	dx = dict(d)
+	dx['.'] = dict(d['.'])
+	dx[var] = np.broadcast_to(d[var], (n,) + d[var].shape)
+	dx['.'][var] = dict(d['.'].get(var, {}),
+		**{'.dims': ['time'] + list(ds.dims(d, var))}
+	)
+	return dx
+
 def keep_var(var, d, do, dim_map={}):
 	dim_map_rev = dict((v, k) for k, v in dim_map.items())
 	if var in ds.vars(d) and dim_map.get('time', 'time') in ds.dims(d, var):
@@ -260,3 +653,348 @@ def bins(a, b, res):
 		else:
 			res = float(res)*(b - a)
 	return np.arange(a, b + res, res)
+
+INDEX_VERSION = 2
+
+# File extensions read by ds.readdir.
+READDIR_EXT = ('.csv', '.tsv', '.tab', '.ds', '.h5', '.hdf5', '.hdf', '.json',
+	'.nc', '.nc4', '.nc3', '.netcdf')
+
+# Indexes loaded or saved in this process by filename, as tuples of the key
+# of the index file and the index. The key is None if the index could not be
+# written, in which case the index is only kept in memory.
+index_cache = {}
+
+def cache_dir():
+	'''Directory of the persistent indexes of input directories:
+	$ALCF_CACHE_DIR, or alcf in $XDG_CACHE_HOME or ~/.cache.'''
+	dirname = os.environ.get('ALCF_CACHE_DIR')
+	if dirname:
+		return dirname
+	return os.path.join(
+		os.environ.get('XDG_CACHE_HOME') or \
+			os.path.join(os.path.expanduser('~'), '.cache'),
+		'alcf'
+	)
+
+def cache_filename(kind, dirname):
+	'''Filename of an index of type kind of a directory or file dirname in
+	the cache directory.'''
+	name = hashlib.sha1(os.path.realpath(dirname).encode('utf-8')).hexdigest()
+	return os.path.join(cache_dir(), kind, name + '.npz')
+
+def index_key(filename):
+	st = os.stat(filename)
+	return (st.st_size, st.st_mtime_ns)
+
+def encode_index(x, arrays):
+	# Encode x as a JSON-serializable object, storing arrays and NumPy scalars
+	# in arrays.
+	if isinstance(x, dict):
+		if not all(isinstance(k, str) for k in x.keys()):
+			raise TypeError('cannot encode dictionary with non-string keys')
+		return {k: encode_index(v, arrays) for k, v in x.items()}
+	if isinstance(x, list):
+		return [encode_index(y, arrays) for y in x]
+	if isinstance(x, tuple):
+		return {'$tuple': [encode_index(y, arrays) for y in x]}
+	if isinstance(x, bytes):
+		return {'$bytes': x.decode('latin-1')}
+	if isinstance(x, (np.ndarray, np.generic)):
+		i = len(arrays)
+		arrays['a%d' % i] = np.ma.getdata(x)
+		if isinstance(x, np.generic):
+			return {'$scalar': i}
+		if isinstance(x, np.ma.MaskedArray):
+			arrays['m%d' % i] = np.ma.getmaskarray(x)
+			return {'$array': i, '$mask': True}
+		return {'$array': i}
+	if x is None or isinstance(x, (bool, int, float, str)):
+		return x
+	raise TypeError('cannot encode object of type %s' % type(x).__name__)
+
+def decode_index(x, arrays):
+	if isinstance(x, list):
+		return [decode_index(y, arrays) for y in x]
+	if not isinstance(x, dict):
+		return x
+	if '$tuple' in x:
+		return tuple(decode_index(y, arrays) for y in x['$tuple'])
+	if '$bytes' in x:
+		return x['$bytes'].encode('latin-1')
+	if '$scalar' in x:
+		return arrays['a%d' % x['$scalar']][()]
+	if '$array' in x:
+		a = arrays['a%d' % x['$array']]
+		if x.get('$mask'):
+			a = np.ma.array(a, mask=arrays['m%d' % x['$array']])
+		return a
+	return {k: decode_index(v, arrays) for k, v in x.items()}
+
+def read_index(filename, keys=None):
+	'''Read an index from an npz file written by write_index. Pickled objects
+	are not allowed. If keys is not None, only the listed top-level items of
+	the index are read.'''
+	with np.load(filename, allow_pickle=False) as f:
+		index = json.loads(str(f['index']))
+		if keys is not None and isinstance(index, dict):
+			index = {k: v for k, v in index.items() if k in keys}
+		return decode_index(index, f)
+
+def write_index(filename, index):
+	'''Write an index of nested dictionaries, lists, tuples, strings, numbers
+	and arrays to an npz file atomically. The structure is stored as JSON
+	and the arrays as npz arrays.'''
+	arrays = {}
+	arrays['index'] = np.array(json.dumps(encode_index(index, arrays)))
+	buf = io.BytesIO()
+	np.savez(buf, **arrays)
+	os.makedirs(os.path.dirname(filename), exist_ok=True)
+	tmp_filename = '%s.%d' % (filename, os.getpid())
+	try:
+		with open(tmp_filename, 'wb') as f:
+			f.write(buf.getvalue())
+		os.replace(tmp_filename, filename)
+	finally:
+		if os.path.exists(tmp_filename):
+			os.remove(tmp_filename)
+
+def load_index(filename, version=INDEX_VERSION):
+	'''Load an index from filename, or from memory if it was already loaded
+	or saved in this process. Returns None if the index does not exist or
+	cannot be read.'''
+	if filename in index_cache and index_cache[filename][0] is None:
+		return index_cache[filename][1]
+	try: key = index_key(filename)
+	except OSError: return None
+	if filename in index_cache and index_cache[filename][0] == key:
+		return index_cache[filename][1]
+	try: index = read_index(filename)
+	except Exception: return None
+	if not isinstance(index, dict) or index.get('version') != version:
+		return None
+	index_cache[filename] = (key, index)
+	return index
+
+def save_index(filename, index, warnings=[], name='index'):
+	'''Save an index to filename. If it cannot be written, it is kept in
+	memory for the rest of the process, and a warning is added to warnings
+	the first time.'''
+	try:
+		write_index(filename, index)
+		index_cache[filename] = (index_key(filename), index)
+		log_output(filename)
+	except (OSError, TypeError, ValueError) as e:
+		if filename not in index_cache or \
+			index_cache[filename][0] is not None:
+			warnings += ['%s: cannot write %s: %s' % (filename, name, e)]
+		index_cache[filename] = (None, index)
+
+def readdir_worker(filename, variables, kwargs):
+	try: d = ds.read(filename, variables, **kwargs)
+	except Exception as e:
+		return None, [('%s: %s' % (filename, e), traceback.format_exc())]
+	return d, []
+
+def readdir(dirname, variables=None, warnings=[], recursive=False, njobs=1,
+	**kwargs):
+	'''Read all data files in a directory like ds.readdir, but keep the
+	datasets in a persistent index of the directory in the cache directory
+	(see cache_dir). Files are only read if they are not in the index or
+	their size or modification time changed. Datasets of unchanged files
+	are returned from the index. The index is also kept in memory for the
+	rest of the process (see load_index), so that worker processes forked
+	after the index is built, e.g. by the index function of model readers,
+	inherit it and do not read it again.'''
+	pattern = '**' if recursive else '*'
+	files = sorted([
+		filename for filename in
+		glob.glob(os.path.join(glob.escape(dirname), pattern),
+			recursive=recursive)
+		if filename.endswith(READDIR_EXT) and os.path.isfile(filename)
+	])
+	query = repr((variables, sorted(kwargs.items())))
+
+	index_filename = cache_filename('index', dirname)
+	index = load_index(index_filename)
+	if index is None:
+		index = {'version': INDEX_VERSION, 'files': {}}
+	else:
+		index = {'version': INDEX_VERSION, 'files': dict(index['files'])}
+	changed = False
+
+	keys = {}
+	update = []
+	for filename in files:
+		name = os.path.relpath(filename, dirname)
+		keys[name] = index_key(filename)
+		entry = index['files'].get(name)
+		if entry is None or entry['key'] != keys[name] or \
+			query not in entry['dd']:
+			update += [filename]
+
+	if len(update) > 0:
+		if njobs > 1 and len(update) > 1:
+			with ProcessPoolExecutor(njobs) as ex:
+				res = list(ex.map(readdir_worker, update,
+					[variables]*len(update), [kwargs]*len(update)))
+		else:
+			res = [readdir_worker(filename, variables, kwargs)
+				for filename in update]
+		for filename, (d, w) in zip(update, res):
+			warnings += w
+			if d is None:
+				continue
+			name = os.path.relpath(filename, dirname)
+			entry = index['files'].get(name)
+			if entry is None or entry['key'] != keys[name]:
+				entry = {'key': keys[name], 'dd': {}}
+			else:
+				entry = {'key': entry['key'], 'dd': dict(entry['dd'])}
+			entry['dd'][query] = d
+			index['files'][name] = entry
+			changed = True
+
+	for name in list(index['files'].keys()):
+		if name not in keys and \
+			not os.path.isfile(os.path.join(dirname, name)):
+			del index['files'][name]
+			changed = True
+
+	if changed:
+		save_index(index_filename, index, warnings)
+
+	dd = []
+	for filename in files:
+		name = os.path.relpath(filename, dirname)
+		entry = index['files'].get(name)
+		if entry is None or entry['key'] != keys[name] or \
+			query not in entry['dd']:
+			continue
+		d = copy.deepcopy(entry['dd'][query])
+		ds.var(d, 'filename', filename)
+		ds.dims(d, 'filename', [])
+		dd += [d]
+	return dd
+
+CATALOGUE_VERSION = 2
+
+def listdir(dirname):
+	'''List files in a directory like os.listdir, but sorted.'''
+	return sorted(os.listdir(dirname))
+
+def file_time_extent(filename):
+	d = ds.read(filename, ['time_bnds'])
+	require_vars(d, ['time_bnds'])
+	if len(d['time_bnds']) == 0:
+		return None
+	return [np.amin(d['time_bnds'][:,0]), np.amax(d['time_bnds'][:,1])]
+
+def catalogue_worker(filename, extent_f):
+	try: extent = extent_f(filename)
+	except Exception as e:
+		return None, None, [('%s: %s' % (filename, e), traceback.format_exc())]
+	try: vars_ = ds.vars(ds.read(filename, [], full=True), full=True)
+	except Exception: vars_ = None
+	return extent, vars_, []
+
+def catalogue(dirname, files, query='time', extent_f=file_time_extent,
+	warnings=[], njobs=1):
+	'''Time extents of files in a directory, kept in a persistent catalogue
+	of the directory in the cache directory (see cache_dir) together with
+	the file size, modification time and variables. The catalogue is
+	updated only for files which are not in it or whose size or
+	modification time changed. query identifies the extent function
+	extent_f, which returns the start and end time of a file or None if the
+	file contains no records. Returns a list of time extents of files, with
+	False for files which could not be read.'''
+	catalogue_filename = cache_filename('catalogue', dirname)
+	cat = load_index(catalogue_filename, CATALOGUE_VERSION)
+	if cat is None:
+		cat = {'version': CATALOGUE_VERSION, 'files': {}}
+	else:
+		cat = {'version': CATALOGUE_VERSION, 'files': dict(cat['files'])}
+	changed = False
+
+	keys = {}
+	update = []
+	for filename in files:
+		name = os.path.relpath(filename, dirname)
+		keys[name] = index_key(filename)
+		entry = cat['files'].get(name)
+		if entry is None or entry['key'] != keys[name] or \
+			query not in entry['time']:
+			update += [filename]
+
+	if len(update) > 0:
+		if njobs > 1 and len(update) > 1:
+			with ProcessPoolExecutor(njobs) as ex:
+				res = list(ex.map(catalogue_worker, update,
+					[extent_f]*len(update)))
+		else:
+			res = [catalogue_worker(filename, extent_f)
+				for filename in update]
+		for filename, (extent, vars_, w) in zip(update, res):
+			warnings += w
+			if len(w) > 0:
+				continue
+			name = os.path.relpath(filename, dirname)
+			entry = cat['files'].get(name)
+			if entry is None or entry['key'] != keys[name]:
+				entry = {'key': keys[name], 'vars': vars_, 'time': {}}
+			else:
+				entry = dict(entry, time=dict(entry['time']))
+			entry['time'][query] = extent
+			cat['files'][name] = entry
+			changed = True
+
+	for name in list(cat['files'].keys()):
+		if name not in keys and \
+			not os.path.isfile(os.path.join(dirname, name)):
+			del cat['files'][name]
+			changed = True
+
+	if changed:
+		save_index(catalogue_filename, cat, warnings, 'catalogue')
+
+	extents = []
+	for filename in files:
+		name = os.path.relpath(filename, dirname)
+		entry = cat['files'].get(name)
+		if entry is None or entry['key'] != keys[name]:
+			extents += [False]
+		else:
+			extents += [entry['time'][query]]
+	return extents
+
+def overlaps(extent, tlim=None, filters=[]):
+	'''Check if a time extent overlaps with time limits tlim and with each
+	of filters (arrays of time bounds). False extents of files which could
+	not be read overlap with everything.'''
+	if extent is False:
+		return True
+	if extent is None:
+		return False
+	if tlim is not None and (extent[1] < tlim[0] or extent[0] > tlim[1]):
+		return False
+	for filter_ in filters:
+		if not np.any(
+			(filter_[:,0] <= extent[1]) &
+			(filter_[:,1] >= extent[0])
+		):
+			return False
+	return True
+
+def select_files(dirname, files, tlim=None, filters=[], warnings=[],
+	**kwargs):
+	'''Select files in a directory which overlap with time limits tlim and
+	with each of filters (arrays of time bounds), based on the catalogue of
+	the directory (see catalogue). Files which could not be read are
+	selected, so that the error is reported when they are read.'''
+	if tlim is None and len(filters) == 0:
+		return files
+	extents = catalogue(dirname, files, warnings=warnings, **kwargs)
+	return [
+		file_ for file_, extent in zip(files, extents)
+		if overlaps(extent, tlim, filters)
+	]
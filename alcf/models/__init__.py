@@ -1,4 +1,5 @@
 import alcf
+from alcf.lazy import LazyMapping
 
 META = {
 	'clw': {
@@ -126,26 +127,15 @@ META = {
 	'.': alcf.META,
 }
 
-from . import amps
-#from . import cmip5
-from . import era5
-from . import jra55
-from . import merra2
-from . import nzcsm
-from . import nzesm
-from . import um
-from . import icon
-from . import icon_intake_healpix
-
-MODELS = {
-	'amps': amps,
-	#'cmip5': cmip5,
-	'era5': era5,
-	'jra55': jra55,
-	'merra2': merra2,
-	'nzcsm': nzcsm,
-	'nzesm': nzesm,
-	'um': um,
-	'icon': icon,
-	'icon_intake_healpix': icon_intake_healpix,
-}
+MODELS = LazyMapping({
+	'amps': '.amps',
+	#'cmip5': '.cmip5',
+	'era5': '.era5',
+	'jra55': '.jra55',
+	'merra2': '.merra2',
+	'nzcsm': '.nzcsm',
+	'nzesm': '.nzesm',
+	'um': '.um',
+	'icon': '.icon',
+	'icon_intake_healpix': '.icon_intake_healpix',
+}, __name__)
@@ -40,11 +40,10 @@ STEP = 3/24
 
 def index(dirname, warnings=[], recursive=False, njobs=1):
 	misc.log_input(dirname)
-	return ds.readdir(dirname, ['XTIME'],
+	return misc.readdir(dirname, ['XTIME'],
 		jd=True,
 		recursive=recursive,
 		warnings=warnings,
-		parallel=(njobs > 1),
 		njobs=njobs,
 		full=True,
 	)
@@ -69,18 +69,27 @@ TRANS_SURF = {
 
 STEP = 1/24
 
-def read0(type_, dirname, track, t1, t2,
-	warnings=[], step=STEP, recursive=False):
-
+def index0(dirname, warnings=[], recursive=False, njobs=1):
 	misc.log_input(dirname)
-	dd_idx = ds.readdir(dirname,
+	return misc.readdir(dirname,
 		VARS_INDEX,
 		jd=True,
 		full=True,
 		warnings=warnings,
 		recursive=recursive,
+		njobs=njobs,
 	)
 
+def index(dirname, warnings=[], recursive=False, njobs=1):
+	for type_ in ['surf', 'plev']:
+		index0(os.path.join(dirname, type_), warnings=warnings,
+			recursive=recursive, njobs=njobs)
+
+def read0(type_, dirname, track, t1, t2,
+	warnings=[], step=STEP, recursive=False):
+
+	dd_idx = index0(dirname, warnings=warnings, recursive=recursive)
+
 	req_vars = {
 		'surf': VARS_SURF,
 		'plev': VARS_PLEV,
@@ -106,72 +115,62 @@ def read0(type_, dirname, track, t1, t2,
 			(time < t2 + step*0.5)
 		)[0]
 		misc.log_input(filename)
-		for i in ii:
-			t = time[i]
-			lon0, lat0 = track(time[i])
-			if np.isnan(lon0) or np.isnan(lat0):
-				continue
-			j = np.argmin(np.abs(lat - lat0))
-			k = np.argmin(np.abs(lon - lon0))
-			d = ds.read(filename, req_vars,
-				sel={'time': [i], 'valid_time': [i], 'latitude': j, 'longitude': k},
-				jd=True,
-			)
-			d_day = ds.read(filename, VARS_DAY,
-				sel={'latitude': j, 'longitude': k},
-				jd=True,
-			)
-			ds.rename(d, 'valid_time', 'time')
-			#d_alltime = ds.read(filename, req_vars,
-			#	sel={'latitude': j, 'longitude': k},
-			#	jd=True,
-			#)
-			#misc.require_vars(d, req_vars)
-			for a, b in trans.items():
-				if a in d.keys():
-					ds.rename(d, a, b)
-				if a in d_day.keys():
-					ds.rename(d_day, a, b)
-			for var in ['rsdt', 'rsnt', 'rlnt']:
-				if var not in d_day: continue
-				shape = list(d_day[var].shape)
-				shape[0] = 1
-				d_day[var] = np.mean(d_day[var], axis=0).reshape(shape)
-			d['lat'] = np.array([d['lat']])
-			d['lon'] = np.array([d['lon']])
-			d['lon'] = d['lon'] % 360
-			d['.']['lat']['.dims'] = ['time']
-			d['.']['lon']['.dims'] = ['time']
-			if type_ == 'surf':
-				d['input_rsdt'] = d_day['rsdt']/3600
-				d['input_rsut'] = -d_day['rsnt']/3600 + d_day['rsdt']/3600
-				d['input_rlut'] = -d_day['rlnt']/3600
-			if type_ == 'plev':
-				order = np.argsort(d['pfull'])[::-1]
-				d['pfull'] = d['pfull'].reshape([1, len(d['pfull'])])
-				d['.']['pfull']['.dims'] = ['time', 'level']
-				d['cl'] = d['cl'][:,order]
-				d['clw'] = d['clw'][:,order]
-				d['cli'] = d['cli'][:,order]
-				d['ta'] = d['ta'][:,order]
-				d['zfull'] = d['zfull'][:,order]
-				d['pfull'] = d['pfull'][:,order]
-				clivi = 0
-				clwvi = 0
-				n = d_day['zfull'].shape[0]
-				for j in range(n):
-					zfull_day = d_day['zfull'][j,order]/9.80665
-					zhalf_day = misc.half(zfull_day)
-					dz = np.diff(zhalf_day)
-					clivi += np.sum(dz*d_day['cli'][j,order])
-					clwvi += np.sum(dz*d_day['clw'][j,order])
-				clivi /= n
-				clwvi /= n
-				d['input_clivi'] = np.array([clivi])
-				d['input_clwvi'] = np.array([clwvi])
-			for var in ['clivi', 'clwvi', 'rsdt', 'rsut', 'rlut']:
-				d['.']['input_'+var] = {'.dims': ['time']}
-			dd.append(d)
+		if len(ii) == 0:
+			continue
+		lonlat0 = np.stack(track(time[ii]), axis=1)
+		mask = ~np.isnan(lonlat0).any(axis=1)
+		ii = ii[mask]
+		lonlat0 = lonlat0[mask]
+		if len(ii) == 0:
+			continue
+		jj = np.array([np.argmin(np.abs(lat - lat0)) for lat0 in lonlat0[:,1]])
+		kk = np.array([np.argmin(np.abs(lon - lon0)) for lon0 in lonlat0[:,0]])
+		# All profiles in the file are read at once. The time dimension is
+		# replaced with a dimension along the profiles, and the daily fields
+		# are read for all times at the profile locations.
+		d = misc.read_points(filename, req_vars,
+			{'time': ii, 'valid_time': ii, 'latitude': jj, 'longitude': kk},
+			dim='time',
+			jd=True,
+		)
+		d_day = misc.read_points(filename, VARS_DAY,
+			{'latitude': jj, 'longitude': kk},
+			dim='profile',
+			jd=True,
+		)
+		ds.rename(d, 'valid_time', 'time')
+		for a, b in trans.items():
+			if a in d.keys():
+				ds.rename(d, a, b)
+			if a in d_day.keys():
+				ds.rename(d_day, a, b)
+		for var in ['rsdt', 'rsnt', 'rlnt']:
+			if var not in d_day: continue
+			d_day[var] = np.mean(d_day[var], axis=1)
+		d['lon'] = d['lon'] % 360
+		if type_ == 'surf':
+			d['input_rsdt'] = d_day['rsdt']/3600
+			d['input_rsut'] = -d_day['rsnt']/3600 + d_day['rsdt']/3600
+			d['input_rlut'] = -d_day['rlnt']/3600
+		if type_ == 'plev':
+			order = np.argsort(d['pfull'])[::-1]
+			d['pfull'] = np.tile(d['pfull'][order], (len(ii), 1))
+			d['.']['pfull']['.dims'] = ['time', 'level']
+			d['cl'] = d['cl'][:,order]
+			d['clw'] = d['clw'][:,order]
+			d['cli'] = d['cli'][:,order]
+			d['ta'] = d['ta'][:,order]
+			d['zfull'] = d['zfull'][:,order]
+			zfull_day = d_day['zfull'][:,:,order]/9.80665
+			zhalf_day = misc.half(zfull_day)
+			dz = np.diff(zhalf_day, axis=-1)
+			d['input_clivi'] = np.mean(
+				np.sum(dz*d_day['cli'][:,:,order], axis=-1), axis=1)
+			d['input_clwvi'] = np.mean(
+				np.sum(dz*d_day['clw'][:,:,order], axis=-1), axis=1)
+		for var in ['clivi', 'clwvi', 'rsdt', 'rsut', 'rlut']:
+			d['.']['input_'+var] = {'.dims': ['time']}
+		dd.append(d)
 	d = ds.op.merge(dd, 'time')
 	if 'pfull' in d:
 		d['pfull'] = 1e2*d['pfull']
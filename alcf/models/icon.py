@@ -16,15 +16,35 @@ VARS = [
 
 STEP = 6/24
 
+# Nearest-cell spatial indexes of grids by grid filename, as tuples of the
+# key of the grid file and the index. Workers forked after index inherit
+# them, so that the index is only built once.
+grid_index_cache = {}
+
+def grid_index_key(vgrid_filename):
+	st = os.stat(vgrid_filename)
+	return [st.st_size, st.st_mtime_ns]
+
+def grid_index(vgrid_filename, d_g):
+	'''Return a nearest-cell spatial index of the grid with cell coordinates
+	in d_g. The index is kept in memory for the rest of the process and
+	rebuilt when the grid file changes.'''
+	key = grid_index_key(vgrid_filename)
+	cached = grid_index_cache.get(vgrid_filename)
+	if cached is not None and cached[0] == key:
+		return cached[1]
+	index = misc.geo_index(d_g['clon'], d_g['clat'])
+	grid_index_cache[vgrid_filename] = (key, index)
+	return index
+
 def index(dirname, warnings=[], recursive=False, njobs=1):
 	misc.log_input(dirname)
-	dd = ds.readdir(dirname,
+	dd = misc.readdir(dirname,
 		variables=['time'],
 		jd=True,
 		full=True,
 		warnings=warnings,
 		recursive=recursive,
-		parallel=(njobs > 1),
 		njobs=njobs,
 	)
 
@@ -37,6 +57,7 @@ def index(dirname, warnings=[], recursive=False, njobs=1):
 	d_g['clon'] *= 180/np.pi
 	d_g['clat'] *= 180/np.pi
 
+	grid_index(vgrid_filename, d_g)
 	return [dd, d_g]
 
 def read(dirname, index, track, t1, t2,
@@ -45,7 +66,7 @@ def read(dirname, index, track, t1, t2,
 	vgrid_filename = os.path.join(dirname, 'vgrid.nc')
 	dd_out = []
 	dd_idx, d_g = index
-	ncells = ds.dim(d_g, 'ncells')
+	g_index = grid_index(vgrid_filename, d_g)
 	vgrid_cache = {}
 
 	misc.log_input(vgrid_filename)
@@ -62,53 +83,51 @@ def read(dirname, index, track, t1, t2,
 				(time < t2 + step*0.5)
 			)[0]
 			misc.log_input(filename)
-			for i in ii:
-				lon0, lat0 = track(time[i])
-				if np.isnan(lon0) or np.isnan(lat0):
-					continue
-				dist = misc.geo_distance(
-					np.full(ncells, lon0),
-					np.full(ncells, lat0),
-					d_g['clon'],
-					d_g['clat'],
-					method='gc'
-				)
-				cell = np.argmin(dist)
-
-				if cell in vgrid_cache:
-					d_g2 = vgrid_cache[cell]
-				else:
-					d_g2 = ds.read(vgrid_filename, ['zg', 'zghalf'], sel={
-						'ncells': cell,
-						'height': ds.dim(d_g, 'height') - 1,
-					})
-					misc.require_vars(d_g2, ['zg', 'zghalf'])
-					vgrid_cache[cell] = d_g2
-
-				d = ds.read(filename, [var],
-					sel={
-						'time': [i],
-						'ncells': cell,
-						'cell': cell,
-					},
-					jd=True,
-				)
-				misc.require_vars(d, [var])
-				ds.rename_dim(d, 'height', 'level')
-				d['time'] = np.array([time[i]])
-				d['lat'] = np.array([d_g['clat'][cell]])
-				d['lon'] = np.array([d_g['clon'][cell]])
-				d['orog'] = np.array([d_g2['zghalf']])
-				d['zfull'] = d_g2['zg'][::-1]
-				d['zfull'] = d['zfull'].reshape((1, len(d['zfull'])))
-				ds.dims(d, 'time', ['time'])
-				ds.dims(d, 'lat', ['time'])
-				ds.dims(d, 'lon', ['time'])
-				ds.dims(d, 'orog', ['time'])
-				ds.dims(d, 'zfull', ['time', 'level'])
-				if d[var].ndim == 2:
-					d[var] = d[var][:,::-1]
-				dd.append(d)
+			if len(ii) == 0:
+				continue
+			lonlat0 = np.stack(track(time[ii]), axis=1)
+			mask = ~np.isnan(lonlat0).any(axis=1)
+			ii = ii[mask]
+			if len(ii) == 0:
+				continue
+			cells = misc.geo_nearest(g_index, lonlat0[mask,0], lonlat0[mask,1])
+
+			cells_new = np.unique([c for c in cells if c not in vgrid_cache])
+			if len(cells_new) > 0:
+				d_g2 = misc.read_points(vgrid_filename, ['zg', 'zghalf'], {
+					'ncells': cells_new,
+					'height': ds.dim(d_g, 'height') - 1,
+				}, dim='ncells')
+				misc.require_vars(d_g2, ['zg', 'zghalf'])
+				for n, cell in enumerate(cells_new):
+					vgrid_cache[cell] = {
+						'zg': d_g2['zg'][n],
+						'zghalf': d_g2['zghalf'][n],
+					}
+
+			d = misc.read_points(filename, [var], {
+					'time': ii,
+					'ncells': cells,
+					'cell': cells,
+				},
+				dim='time',
+				jd=True,
+			)
+			misc.require_vars(d, [var])
+			ds.rename_dim(d, 'height', 'level')
+			d['time'] = time[ii]
+			d['lat'] = d_g['clat'][cells]
+			d['lon'] = d_g['clon'][cells]
+			d['orog'] = np.array([vgrid_cache[c]['zghalf'] for c in cells])
+			d['zfull'] = np.array([vgrid_cache[c]['zg'][::-1] for c in cells])
+			ds.dims(d, 'time', ['time'])
+			ds.dims(d, 'lat', ['time'])
+			ds.dims(d, 'lon', ['time'])
+			ds.dims(d, 'orog', ['time'])
+			ds.dims(d, 'zfull', ['time', 'level'])
+			if d[var].ndim == 2:
+				d[var] = d[var][:,::-1]
+			dd.append(d)
 		d = ds.op.merge(dd, 'time')
 		dd_out += [d]
 
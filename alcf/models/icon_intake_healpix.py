@@ -65,9 +65,10 @@ def read(dirname, index, track, t1, t2,
 		(time < t2 + step*0.5)
 	)[0]
 	dd = []
-	for i in ii:
+	lonlat = track(time[ii])
+	for n, i in enumerate(ii):
 		t = time[i]
-		lon, lat = track(t)
+		lon, lat = lonlat[0][n], lonlat[1][n]
 		if np.isnan(lon) or np.isnan(lat):
 			continue
 		dt = t - time_daily
@@ -42,6 +42,19 @@ TRANS = {
 
 STEP = 6/24
 
+def index0(dirname, warnings=[], recursive=False, njobs=1):
+	misc.log_input(dirname)
+	return misc.readdir(dirname, VARS_INDEX,
+		jd=True,
+		full=True,
+		warnings=warnings,
+		recursive=recursive,
+		njobs=njobs,
+	)
+
+def index(dirname, warnings=[], recursive=False, njobs=1):
+	index0(dirname, warnings=warnings, recursive=recursive, njobs=njobs)
+
 def read(dirname, index, track, t1, t2,
 	warnings=[], step=STEP, recursive=False):
 
@@ -54,13 +67,7 @@ def read(dirname, index, track, t1, t2,
 	lon_ll = d_ll['longitude']
 	orog_ll = d_ll['z'][0,:,:]/9.80665
 
-	misc.log_input(dirname)
-	dd_idx = ds.readdir(dirname, VARS_INDEX,
-		jd=True,
-		full=True,
-		warnings=warnings,
-		recursive=recursive,
-	)
+	dd_idx = index0(dirname, warnings=warnings, recursive=recursive)
 	do = {}
 	for var in VARS:
 		dd = []
@@ -78,9 +85,10 @@ def read(dirname, index, track, t1, t2,
 				(time < t2 + step*0.5)
 			)[0]
 			misc.log_input(filename)
-			for i in ii:
+			lonlat0 = track(time[ii])
+			for n, i in enumerate(ii):
 				t = time[i]
-				lon0, lat0 = track(time[i])
+				lon0, lat0 = lonlat0[0][n], lonlat0[1][n]
 				if np.isnan(lon0) or np.isnan(lat0):
 					continue
 				j = np.argmin(np.abs(lat - lat0))
@@ -43,18 +43,28 @@ def ignore_warnings():
 	warn.filterwarnings('ignore', message='invalid value encountered in cast')
 	warn.filterwarnings('ignore', message='WARNING: valid_range not used since it\ncannot be safely cast to variable data type')
 
+def index0(dirname, recursive=False, njobs=1):
+	dirname_3d = os.path.join(dirname, 'M2I3NVASM')
+	with warn.catch_warnings():
+		ignore_warnings()
+		print('<- %s' % dirname_3d)
+		return misc.readdir(dirname_3d, VARS_INDEX,
+			jd=True,
+			recursive=recursive,
+			njobs=njobs,
+		)
+
+def index(dirname, warnings=[], recursive=False, njobs=1):
+	index0(dirname, recursive=recursive, njobs=njobs)
+
 def read(dirname, index, track, t1, t2,
 	warnings=[], step=STEP, recursive=False):
 
-	dirname_3d = os.path.join(dirname, 'M2I3NVASM')
 	dirname_flx = os.path.join(dirname, 'M2T1NXFLX')
 	dirname_surf = os.path.join(dirname, 'M2I1NXASM')
 	dirname_rad = os.path.join(dirname, 'M2T1NXRAD')
 
-	with warn.catch_warnings():
-		ignore_warnings()
-		print('<- %s' % dirname_3d)
-		dd_index = ds.readdir(dirname_3d, VARS_INDEX, jd=True, recursive=recursive)
+	dd_index = index0(dirname, recursive=recursive)
 
 	dd = []
 	for d_index in dd_index:
@@ -72,81 +82,77 @@ def read(dirname, index, track, t1, t2,
 			(time < t2 + step*0.5)
 		)[0]
 		print('<- %s' % filename)
-		for i in ii:
-			t = time[i]
-			lon0, lat0 = track(time[i])
-			if np.isnan(lon0) or np.isnan(lat0):
-				continue
-			j = np.argmin(np.abs(lat - lat0))
-			k = np.argmin(np.abs(lon - lon0))
-			with warn.catch_warnings():
-				ignore_warnings()
-				d = ds.read(filename, VARS,
-					sel={'time': i, 'lat': j, 'lon': k}
-				)
-				misc.require_vars(d, VARS)
-			with warn.catch_warnings():
-				ignore_warnings()
-				print('<- %s' % filename_flx)
-				d_flx = ds.read(filename_flx, variables=VARS_FLX,
-					sel={'time': i, 'lat': j, 'lon': k}
-				)
-				misc.require_vars(d_flx, VARS_FLX)
+		if len(ii) == 0:
+			continue
+		lonlat0 = np.stack(track(time[ii]), axis=1)
+		mask = ~np.isnan(lonlat0).any(axis=1)
+		ii = ii[mask]
+		lonlat0 = lonlat0[mask]
+		if len(ii) == 0:
+			continue
+		jj = np.array([np.argmin(np.abs(lat - lat0)) for lat0 in lonlat0[:,1]])
+		kk = np.array([np.argmin(np.abs(lon - lon0)) for lon0 in lonlat0[:,0]])
+		sel = {'time': ii, 'lat': jj, 'lon': kk}
+		with warn.catch_warnings():
+			ignore_warnings()
+			d = misc.read_points(filename, VARS, sel)
+			misc.require_vars(d, VARS)
+		with warn.catch_warnings():
+			ignore_warnings()
+			print('<- %s' % filename_flx)
+			d_flx = misc.read_points(filename_flx, VARS_FLX, sel)
+			misc.require_vars(d_flx, VARS_FLX)
 
-				print('<- %s' % filename_surf)
-				d_surf = ds.read(filename_surf, variables=VARS_SURF,
-					sel={'time': i, 'lat': j, 'lon': k}
-				)
-				misc.require_vars(d_surf, VARS_SURF)
+			print('<- %s' % filename_surf)
+			d_surf = misc.read_points(filename_surf, VARS_SURF, sel)
+			misc.require_vars(d_surf, VARS_SURF)
 
-				print('<- %s' % filename_rad)
-				d_rad = ds.read(filename_rad, variables=VARS_RAD,
-					sel={'lat': j, 'lon': k}
-				)
-				misc.require_vars(d_rad, VARS_RAD)
-			clw = d['QL'][::-1]
-			cli = d['QI'][::-1]
-			cl = d['CLOUD'][::-1]*100.
-			ps = d['PS']
-			pr = d_flx['PRECTOTCORR']
-			sic = d_flx['FRSEAICE']
-			tas = d_surf['T2M']
-			rlut = np.mean(d_rad['LWTUP'], axis=0)
-			rsdt = np.mean(d_rad['SWTDN'], axis=0)
-			rsut =  np.mean(d_rad['SWTDN'] - d_rad['SWTNT'], axis=0)
-			orog = d['PHIS']/9.80665
-			pfull = d['PL'][::-1]
-			zfull = d['H'][::-1]
-			ta = d['T'][::-1]
-			zhalf = misc.half(zfull)
-			dz = np.diff(zhalf)
-			clivi = np.sum(dz*cli)
-			clwvi = np.sum(dz*clw)
-			nlev = len(clw)
-			newshape4 = (1, nlev)
-			newshape3 = (1,)
-			d_new = {
-				'clw': clw.reshape(newshape4),
-				'cli': cli.reshape(newshape4),
-				'ta': ta.reshape(newshape4),
-				'cl': cl.reshape(newshape4),
-				'pfull': pfull.reshape(newshape4),
-				'zfull': zfull.reshape(newshape4),
-				'ps': ps.reshape(newshape3),
-				'input_pr': pr.reshape(newshape3),
-				'input_sic': sic.reshape(newshape3),
-				'input_tas': tas.reshape(newshape3),
-				'input_rlut': rlut.reshape(newshape3),
-				'input_rsdt': rsdt.reshape(newshape3),
-				'input_rsut': rsut.reshape(newshape3),
-				'input_clivi': clivi.reshape(newshape3),
-				'input_clwvi': clwvi.reshape(newshape3),
-				'orog': orog.reshape(newshape3),
-				'lat': np.array([lat[j]]),
-				'lon': np.array([lon[k]]),
-				'time': np.array([t]),
-				'.': META,
-			}
-			dd.append(d_new)
+			print('<- %s' % filename_rad)
+			d_rad = misc.read_points(filename_rad, VARS_RAD,
+				{'lat': jj, 'lon': kk},
+				dim='profile',
+			)
+			misc.require_vars(d_rad, VARS_RAD)
+		clw = d['QL'][:,::-1]
+		cli = d['QI'][:,::-1]
+		cl = d['CLOUD'][:,::-1]*100.
+		ps = d['PS']
+		pr = d_flx['PRECTOTCORR']
+		sic = d_flx['FRSEAICE']
+		tas = d_surf['T2M']
+		rlut = np.mean(d_rad['LWTUP'], axis=1)
+		rsdt = np.mean(d_rad['SWTDN'], axis=1)
+		rsut =  np.mean(d_rad['SWTDN'] - d_rad['SWTNT'], axis=1)
+		orog = d['PHIS']/9.80665
+		pfull = d['PL'][:,::-1]
+		zfull = d['H'][:,::-1]
+		ta = d['T'][:,::-1]
+		zhalf = misc.half(zfull)
+		dz = np.diff(zhalf, axis=-1)
+		clivi = np.sum(dz*cli, axis=-1)
+		clwvi = np.sum(dz*clw, axis=-1)
+		d_new = {
+			'clw': clw,
+			'cli': cli,
+			'ta': ta,
+			'cl': cl,
+			'pfull': pfull,
+			'zfull': zfull,
+			'ps': ps,
+			'input_pr': pr,
+			'input_sic': sic,
+			'input_tas': tas,
+			'input_rlut': rlut,
+			'input_rsdt': rsdt,
+			'input_rsut': rsut,
+			'input_clivi': clivi,
+			'input_clwvi': clwvi,
+			'orog': orog,
+			'lat': lat[jj],
+			'lon': lon[kk],
+			'time': time[ii],
+			'.': META,
+		}
+		dd.append(d_new)
 	d = ds.op.merge(dd, 'time')
 	return d
@@ -19,12 +19,21 @@ VARS = [
 
 STEP = 2/24
 
+def index0(dirname, recursive=False, njobs=1):
+	misc.log_input(dirname)
+	return misc.readdir(dirname, VARS_INDEX,
+		jd=True,
+		recursive=recursive,
+		njobs=njobs,
+	)
+
+def index(dirname, warnings=[], recursive=False, njobs=1):
+	index0(dirname, recursive=recursive, njobs=njobs)
+
 def read(dirname, index, track, t1, t2,
 	warnings=[], step=STEP, recursive=False):
 
-	misc.log_input(dirname)
-	dd_index = ds.readdir(dirname, VARS_INDEX,
-		jd=True, recursive=recursive)
+	dd_index = index0(dirname, recursive=recursive)
 	dd = []
 	for d_index in dd_index:
 		misc.require_vars(d_index, VARS_INDEX)
@@ -35,8 +44,9 @@ def read(dirname, index, track, t1, t2,
 		filename = d_index['filename']
 		ii = np.where((time >= t1 - step*0.5) & (time <= t2 + step*0.5))[0]
 		misc.log_input(filename)
-		for i in ii:
-			lon0, lat0 = track(time[i])
+		lonlat0 = track(time[ii])
+		for n, i in enumerate(ii):
+			lon0, lat0 = lonlat0[0][n], lonlat0[1][n]
 			if np.isnan(lon0) or np.isnan(lat0):
 				continue
 			l = np.argmin((lon - lon0)**2 + (lat - lat0)**2)
@@ -26,14 +26,21 @@ TRANS = {
 
 STEP = 6/24
 
-def read(dirname, index, track, t1, t2, warnings=[], step=STEP):
+def index0(dirname, warnings=[], njobs=1):
 	print('<- %s' % dirname)
-	dd_index = ds.readdir(dirname,
+	return misc.readdir(dirname,
 		VARS_INDEX,
 		jd=True,
 		full=True,
 		warnings=warnings,
+		njobs=njobs,
 	)
+
+def index(dirname, warnings=[], recursive=False, njobs=1):
+	index0(dirname, warnings=warnings, njobs=njobs)
+
+def read(dirname, index, track, t1, t2, warnings=[], step=STEP):
+	dd_index = index0(dirname, warnings=warnings)
 	d_var = {}
 	for var in VARS:
 		dd = []
@@ -49,9 +56,10 @@ def read(dirname, index, track, t1, t2, warnings=[], step=STEP):
 			filename = d_index['filename']
 			ii = np.nonzero((time_half[1:] >= t1) & (time_half[:-1] < t2))[0]
 			print('<- %s' % filename)
-			for i in ii:
+			lonlat0 = track(time[ii])
+			for n, i in enumerate(ii):
 				t = time[i]
-				lon0, lat0 = track(time[i])
+				lon0, lat0 = lonlat0[0][n], lonlat0[1][n]
 				if np.isnan(lon0) or np.isnan(lat0):
 					continue
 				j = np.argmin(np.abs(lat - lat0))
@@ -36,6 +36,20 @@ TRANS = {
 
 STEP = 1/24
 
+def index0(dirname, warnings=[], recursive=False, njobs=1):
+	misc.log_input(dirname)
+	return misc.readdir(dirname,
+		VARS_INDEX,
+		jd=True,
+		full=True,
+		warnings=warnings,
+		recursive=recursive,
+		njobs=njobs,
+	)
+
+def index(dirname, warnings=[], recursive=False, njobs=1):
+	index0(dirname, warnings=warnings, recursive=recursive, njobs=njobs)
+
 def read(dirname, index, track, t1, t2,
 	warnings=[], step=STEP, recursive=False):
 
@@ -45,14 +59,7 @@ def read(dirname, index, track, t1, t2,
 	d_orog = ds.read(orog_filename, req_vars)
 	misc.require_vars(d_orog, req_vars)
 
-	misc.log_input(dirname)
-	dd_idx = ds.readdir(dirname,
-		VARS_INDEX,
-		jd=True,
-		full=True,
-		warnings=warnings,
-		recursive=recursive,
-	)
+	dd_idx = index0(dirname, warnings=warnings, recursive=recursive)
 
 	dd = []
 	for d_idx in dd_idx:
@@ -70,33 +77,36 @@ def read(dirname, index, track, t1, t2,
 			(time < t2 + step*0.5)
 		)[0]
 		misc.log_input(filename)
-		for i in ii:
-			t = time[i]
-			lon0, lat0 = track(time[i])
-			if np.isnan(lon0) or np.isnan(lat0):
-				continue
-			j = np.argmin(np.abs(lat - lat0))
-			k = np.argmin(np.abs(lon - lon0))
-			d = ds.read(filename, VARS,
-				sel={'TALLTS': [i], 'latitude_t': j, 'longitude_t': k},
-				jd=True,
-			)
-			misc.require_vars(d, VARS)
-			for a, b in TRANS.items():
-				if a in d.keys():
-					ds.rename(d, a, b)
-			d['lat'] = np.array([d['lat']])
-			d['lon'] = np.array([d['lon']])
-			d['.']['lat']['.dims'] = ['time']
-			d['.']['lon']['.dims'] = ['time']
-			orog = d_orog['surface_altitude'][j,k]
-			d['zfull'] = d['eta']*85000. + orog*(1. - d['eta']/d['eta'][51])**2
-			d['zfull'] = d['zfull'].reshape([1, len(d['zfull'])])
-			d['.']['zfull'] = {'.dims': ['time', 'level']}
-			d['orog'] = np.array([orog], np.float64)
-			d['.']['orog'] = {'.dims': ['time']}
-			del d['eta']
-			dd.append(d)
+		if len(ii) == 0:
+			continue
+		lonlat0 = np.stack(track(time[ii]), axis=1)
+		mask = ~np.isnan(lonlat0).any(axis=1)
+		ii = ii[mask]
+		lonlat0 = lonlat0[mask]
+		if len(ii) == 0:
+			continue
+		jj = np.array([np.argmin(np.abs(lat - lat0)) for lat0 in lonlat0[:,1]])
+		kk = np.array([np.argmin(np.abs(lon - lon0)) for lon0 in lonlat0[:,0]])
+		d = misc.read_points(filename, VARS,
+			{'TALLTS': ii, 'latitude_t': jj, 'longitude_t': kk},
+			dim='TALLTS',
+			jd=True,
+		)
+		misc.require_vars(d, VARS)
+		for a, b in TRANS.items():
+			if a in d.keys():
+				ds.rename(d, a, b)
+		d['.']['lat']['.dims'] = ['time']
+		d['.']['lon']['.dims'] = ['time']
+		orog = d_orog['surface_altitude'][jj,kk]
+		eta = d['eta'][np.newaxis,:]
+		d['zfull'] = eta*85000. + \
+			orog[:,np.newaxis]*(1. - eta/eta[:,51:52])**2
+		d['.']['zfull'] = {'.dims': ['time', 'level']}
+		d['orog'] = np.array(orog, np.float64)
+		d['.']['orog'] = {'.dims': ['time']}
+		del d['eta']
+		dd.append(d)
 	d = ds.op.merge(dd, 'time')
 	d['cl'] *= 100.
 	return d
@@ -0,0 +1,71 @@
+'''Benchmark of the default cloud base detection algorithm.
+
+Compares alcf.algorithms.cloud_base_detection.default with the per-profile
+and per-column loop it replaced on a synthetic cloud mask shaped like the
+output of alcf lidar for COSP simulated data with 10 columns, checks that
+the results are the same, and prints the run times.
+
+Usage: python benchmarks/cloud_base_detection.py [<nprofiles>] [<ncolumns>]
+'''
+
+import sys
+import time
+import numpy as np
+from alcf.algorithms.cloud_base_detection import default
+
+def dataset(n, l, m=300, seed=0):
+	rng = np.random.default_rng(seed)
+	zfull = np.arange(m)*50. + 25.
+	cloud_mask = np.array(rng.random((n, m, l)) < 0.01, np.float64)
+	cloud_mask *= rng.random((n, 1, l)) >= 0.2
+	cloud_mask[rng.random((n, m, l)) < 0.0005] = np.nan
+	return {
+		'zfull': zfull,
+		'cloud_mask': cloud_mask,
+		'.': {
+			'zfull': {'.dims': ['level']},
+			'cloud_mask': {'.dims': ['time', 'level', 'column']},
+		},
+	}
+
+def cloud_base_detection_loop(d):
+	cloud_mask = d['cloud_mask']
+	n, m, l = cloud_mask.shape
+	cbh = np.zeros((n, l), dtype=np.float64)
+	for i in range(n):
+		for j in range(l):
+			x = cloud_mask[i,:,j]
+			kk = np.where(x == 1)[0]
+			if np.any(np.isnan(x)):
+				cbh[i,j] = np.nan
+			elif len(kk) > 0:
+				cbh[i,j] = d['zfull'][kk[0]]
+			else:
+				cbh[i,j] = np.inf
+	d['cbh'] = cbh
+
+def run(f, d):
+	t0 = time.perf_counter()
+	f(d)
+	return d['cbh'], time.perf_counter() - t0
+
+def main(n=8640, l=10):
+	d = dataset(n, l)
+	cbh1, t1 = run(cloud_base_detection_loop, d)
+	cbh2, t2 = run(default.cloud_base_detection, d)
+	if not np.array_equal(cbh1, cbh2, equal_nan=True):
+		raise AssertionError('cbh differs')
+	cbh3, _ = run(default.cloud_base_detection, {
+		'zfull': d['zfull'],
+		'cloud_mask': d['cloud_mask'][:,:,0],
+		'.': {},
+	})
+	if not np.array_equal(cbh1[:,0], cbh3, equal_nan=True):
+		raise AssertionError('cbh differs for a 2-D cloud mask')
+	print('profiles: %d, columns: %d' % (n, l))
+	print('loop: %.3f s' % t1)
+	print('vectorised: %.3f s' % t2)
+	print('speed-up: %.1fx' % (t1/t2))
+
+if __name__ == '__main__':
+	main(*[int(x) for x in sys.argv[1:]])
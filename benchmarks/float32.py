@@ -0,0 +1,89 @@
+'''Validation and benchmark of the float32 processing mode of alcf lidar.
+
+Processes lidar data with alcf lidar with dtype float64 and float32, and
+calculates cloud occurrence statistics of both outputs with alcf stats.
+Prints the maximum relative difference in backscatter of at least 1e-7
+m-1 sr-1, the number of differently classified cloud mask cells and cloud
+base heights, the maximum absolute difference of the cloud occurrence and
+total cloud fraction, and the run times and output sizes. No test data
+are included, so lidar data have to be supplied.
+
+Usage: python benchmarks/float32.py <type> <input> [<options>...]
+
+Arguments:
+
+- type: Lidar type (see alcf lidar).
+- input: Input filename or directory.
+- options: alcf lidar and alcf stats options as `<name>: <value>`, e.g.
+  `zlim: { 0 10000 }`.
+'''
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import ds_format as ds
+import pst
+from alcf.cmds import lidar, stats
+
+def output_size(dirname):
+	return sum(os.path.getsize(os.path.join(dirname, file_))
+		for file_ in os.listdir(dirname))
+
+def run(type_, input_, dirname, dtype, zlim=[0., 15000.], **options):
+	output = os.path.join(dirname, dtype)
+	os.mkdir(output)
+	t0 = time.perf_counter()
+	lidar.run(type_, input_, output, dtype=dtype, zlim=zlim, **options)
+	t = time.perf_counter() - t0
+	stats_output = os.path.join(dirname, dtype + '_stats.nc')
+	stats.run(output, stats_output, zlim=zlim)
+	return output, stats_output, t
+
+def read(dirname, variables):
+	dd = [ds.read(os.path.join(dirname, file_), variables)
+		for file_ in sorted(os.listdir(dirname))]
+	return {var: np.concatenate([np.ma.filled(d[var], np.nan) for d in dd])
+		for var in variables}
+
+def rel_diff(x1, x2, min_=1e-7):
+	mask = np.isfinite(x1) & np.isfinite(x2) & (np.abs(x1) >= min_)
+	return np.max(np.abs(x2[mask] - x1[mask])/np.abs(x1[mask])) \
+		if np.any(mask) else 0.
+
+def diff(x1, x2):
+	return ~((x1 == x2) | (np.isnan(x1) & np.isnan(x2)))
+
+def main(type_, input_, **options):
+	with tempfile.TemporaryDirectory() as dirname:
+		output1, stats1, t1 = run(type_, input_, dirname, 'float64', **options)
+		output2, stats2, t2 = run(type_, input_, dirname, 'float32', **options)
+		variables = ['backscatter', 'cloud_mask', 'cbh']
+		d1 = read(output1, variables)
+		d2 = read(output2, variables)
+		s1 = ds.read(stats1, ['cl', 'clt'])
+		s2 = ds.read(stats2, ['cl', 'clt'])
+		cloud_mask_diff = diff(d1['cloud_mask'], d2['cloud_mask'])
+		cbh_diff = diff(d1['cbh'], d2['cbh'])
+		print('backscatter dtype: %s' % d2['backscatter'].dtype)
+		print('backscatter max. rel. difference: %.3g' %
+			rel_diff(d1['backscatter'], d2['backscatter']))
+		print('cloud_mask differences: %d of %d (%.3g%%)' % (
+			np.sum(cloud_mask_diff), cloud_mask_diff.size,
+			100*np.mean(cloud_mask_diff),
+		))
+		print('cbh differences: %d of %d' % (np.sum(cbh_diff), cbh_diff.size))
+		print('cl max. abs. difference: %.3g%%' %
+			np.nanmax(np.abs(s2['cl'] - s1['cl'])))
+		print('clt max. abs. difference: %.3g%%' %
+			np.nanmax(np.abs(s2['clt'] - s1['clt'])))
+		print('float64: %.3f s, %d bytes' % (t1, output_size(output1)))
+		print('float32: %.3f s, %d bytes' % (t2, output_size(output2)))
+
+if __name__ == '__main__':
+	args, kwargs = pst.decode_argv(sys.argv, as_unicode=True)
+	if len(args) != 3:
+		sys.stderr.write(__doc__)
+		sys.exit(1)
+	main(*args[1:], **kwargs)
@@ -0,0 +1,111 @@
+'''Benchmark of the output sampling in alcf.algorithms.output_sample.
+
+Compares output_sample with the per-interval and per-profile loop it
+replaced on synthetic lidar data with masked and NaN elements and input
+intervals which do not align with the output intervals, checks that the
+results are the same, and prints the run times.
+
+Usage: python benchmarks/output_sample.py [<nprofiles>] [<nlevels>]
+'''
+
+import sys
+import time
+import copy
+import numpy as np
+import ds_format as ds
+from alcf import misc
+from alcf.algorithms import output_sample
+
+def dataset(n, m, tres=300/86400, seed=0):
+	rng = np.random.default_rng(seed)
+	t0 = 2459000.5
+	time_bnds = np.stack([
+		t0 + np.arange(n)*tres*0.7,
+		t0 + np.arange(n)*tres*0.7 + tres,
+	], axis=1)
+	time_bnds[:,1] = np.minimum(time_bnds[:,1], t0 + 1)
+	backscatter = np.ma.array(rng.random((n, m))*1e-5)
+	# Masked levels below the first range gate and above the maximum range,
+	# as produced by tsample, and NaN elements.
+	backscatter[rng.random((n, m)) < 0.01] = np.nan
+	backscatter[:,:2] = np.ma.masked
+	backscatter[:,-5:] = np.ma.masked
+	return {
+		'time': np.mean(time_bnds, axis=1),
+		'time_bnds': time_bnds,
+		'backscatter': backscatter,
+		'lr': rng.random(n)*50,
+		'.': {
+			'time': {'.dims': ['time']},
+			'time_bnds': {'.dims': ['time', 'bnds']},
+			'backscatter': {'.dims': ['time', 'level']},
+			'lr': {'.dims': ['time']},
+		},
+	}
+
+def output_sample_loop(d, tres, output_sampling, epsilon=1/86400, align=True):
+	t = d['time_bnds'][0,0]
+	if align:
+		t1 = misc.period_start(t, output_sampling, epsilon)
+		t2 = misc.period_start(t1 + output_sampling, output_sampling, epsilon)
+	else:
+		t1 = t
+		t2 = t1 + output_sampling
+	n2 = int(output_sampling/tres)
+	time_bnds = d['time_bnds']
+	time_half2 = np.linspace(t1, t2, n2 + 1)
+	for var in ds.vars(d):
+		if 'time' not in d['.'][var]['.dims']:
+			continue
+		i = d['.'][var]['.dims'].index('time')
+		x = d[var]
+		size = x.shape
+		size2 = list(size)
+		size2[i] = n2
+		x2 = np.full(size2, np.nan, dtype=x.dtype)
+		for j in range(n2):
+			mask = np.maximum(0,
+				np.minimum(time_bnds[:,1], time_half2[j + 1]) -
+				np.maximum(time_bnds[:,0], time_half2[j])
+			)
+			s = np.sum(mask)
+			if s > 0.:
+				mask /= np.sum(mask)
+			sel2 = tuple([
+				slice(None) if l != i else j
+				for l in range(len(size))
+			])
+			for k in np.argwhere(mask > 0)[:,0]:
+				sel = tuple([
+					slice(None) if l != i else k
+					for l in range(len(size))
+				])
+				x2[sel2] = np.where(np.isnan(x2[sel2])*mask[k], 0, x2[sel2]) + \
+					x[sel]*mask[k]
+		d[var] = x2
+
+def run(f, d, tres, output_sampling):
+	d = copy.copy(d)
+	t0 = time.perf_counter()
+	f(d, tres, output_sampling)
+	return d, time.perf_counter() - t0
+
+def main(n=1000, m=300):
+	tres = 300/86400
+	d = dataset(n, m, tres)
+	d1, t1 = run(output_sample_loop, d, tres, 1.)
+	d2, t2 = run(output_sample.output_sample, d, tres, 1.)
+	for var in ['backscatter', 'lr']:
+		if not np.allclose(d1[var], d2[var], rtol=1e-12, atol=0,
+			equal_nan=True):
+			raise AssertionError('%s differs' % var)
+	nonempty = ~np.isnan(d2['lr'])
+	if np.any(np.isnan(d2['backscatter'][nonempty,:2])):
+		raise AssertionError('masked input is NaN in the output')
+	print('profiles: %d, levels: %d' % (n, m))
+	print('loop: %.3f s' % t1)
+	print('vectorised: %.3f s' % t2)
+	print('speed-up: %.1fx' % (t1/t2))
+
+if __name__ == '__main__':
+	main(*[int(x) for x in sys.argv[1:]])
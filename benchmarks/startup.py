@@ -0,0 +1,73 @@
+'''Benchmark of the alcf command startup time.
+
+Measures the run time of `alcf --version` and the import time of each
+command module in a new Python process, and checks that starting the
+command line interface does not import any of the heavy dependencies,
+which are only to be imported by the commands which need them. Exits with
+a non-zero status if a heavy dependency is imported at startup or if the
+median run time of `alcf --version` exceeds the limit.
+
+Usage: python benchmarks/startup.py [<limit>] [<repeat>]
+
+Arguments:
+
+- limit: Maximum median run time of `alcf --version` (seconds). Default: 0.5.
+- repeat: Number of runs. Default: 5.
+'''
+
+import sys
+import time
+import subprocess
+import numpy as np
+from alcf.cmds import CMDS
+
+HEAVY = ['astropy', 'matplotlib', 'scipy', 'cdsapi', 'requests', 'netCDF4']
+
+def python(code):
+	return subprocess.run([sys.executable, '-c', code],
+		check=True,
+		capture_output=True,
+		text=True,
+	).stdout
+
+def startup_modules():
+	return python('''import sys
+import alcf.bin.alcf
+print(' '.join(sys.modules))''').split()
+
+def run_time(args, repeat):
+	tt = []
+	for _ in range(repeat):
+		t0 = time.perf_counter()
+		subprocess.run([sys.executable, '-m', 'alcf.bin.alcf'] + args,
+			check=True,
+			capture_output=True,
+		)
+		tt += [time.perf_counter() - t0]
+	return np.median(tt)
+
+def import_time(name):
+	return float(python('''import time
+t0 = time.perf_counter()
+import alcf.cmds.%s
+print(time.perf_counter() - t0)''' % name))
+
+def main(limit=0.5, repeat=5):
+	status = 0
+	modules = startup_modules()
+	heavy = [m for m in HEAVY if m in modules]
+	t = run_time(['--version'], repeat)
+	print('alcf --version: %.3f s' % t)
+	for name in CMDS:
+		print('import alcf.cmds.%s: %.3f s' % (name, import_time(name)))
+	if len(heavy) > 0:
+		print('error: imported at startup: %s' % ', '.join(heavy))
+		status = 1
+	if t > limit:
+		print('error: alcf --version is slower than %.3f s' % limit)
+		status = 1
+	return status
+
+if __name__ == '__main__':
+	sys.exit(main(*[float(x) for x in sys.argv[1:2]],
+		*[int(x) for x in sys.argv[2:3]]))
@@ -0,0 +1,151 @@
+'''Benchmark of the profile accumulation and histograms in
+alcf.algorithms.stats.
+
+Compares stats.map_profiles and stats.hist with the per-profile and
+per-level loops they replaced on synthetic lidar data, checks that the
+results are the same (up to floating point rounding), and prints the run
+times.
+
+Usage: python benchmarks/stats_map.py [<nprofiles>] [<ncolumns>]
+'''
+
+import sys
+import time
+import numpy as np
+from alcf.algorithms import stats
+
+OPTIONS = {
+	'blim': [5., 200.],
+	'bres': 5.,
+	'bsd_lim': [0.001, 10.],
+	'bsd_log': True,
+	'bsd_res': 0.001,
+	'bsd_z': 8000.,
+	'zlim': [0., 15000.],
+	'zres': 100.,
+	'keep_vars': ['input_tas'],
+	'keep_vars_lim': {},
+	'keep_vars_log': {},
+	'keep_vars_res': {},
+}
+
+def dataset(n, l, m=100, seed=0):
+	rng = np.random.default_rng(seed)
+	time = 2459000.5 + np.arange(n)/288.
+	zfull = np.linspace(50., 15000., m)
+	cloud_mask = rng.random((n, m, l)) < 0.05
+	cbh = np.where(np.any(cloud_mask, axis=1),
+		zfull[np.argmax(cloud_mask, axis=1)], np.nan)
+	input_tas = 273.15 + 10*rng.random(n)
+	input_tas[rng.random(n) < 0.01] = np.nan
+	backscatter = rng.random((n, m, l))*100.
+	backscatter[rng.random(n) < 0.01] = np.nan
+	return {
+		'time': time,
+		'time_bnds': np.stack([time - 0.5/288., time + 0.5/288.], axis=1),
+		'zfull': zfull,
+		'lon': np.full(n, 170.),
+		'lat': np.full(n, -45.),
+		'cloud_mask': cloud_mask,
+		'cbh': cbh,
+		'backscatter': backscatter,
+		'backscatter_mol': rng.random((n, m)),
+		'input_tas': input_tas,
+		'.': {
+			'time': {'.dims': ['time']},
+			'time_bnds': {'.dims': ['time', 'bnds']},
+			'zfull': {'.dims': ['level']},
+			'lon': {'.dims': ['time']},
+			'lat': {'.dims': ['time']},
+			'cloud_mask': {'.dims': ['time', 'level', 'column']},
+			'cbh': {'.dims': ['time', 'column']},
+			'backscatter': {
+				'.dims': ['time', 'level', 'column'],
+				'long_name': 'backscatter',
+			},
+			'backscatter_mol': {
+				'.dims': ['time', 'level'],
+				'long_name': 'molecular backscatter',
+			},
+			'input_tas': {
+				'.dims': ['time'],
+				'long_name': 'near-surface air temperature',
+			},
+		},
+	}
+
+def map_profiles_loop(d, s, mask):
+	n = len(d['time'])
+	for i in range(n):
+		dt = 24*60*60*(d['time_bnds'][i,1] - d['time_bnds'][i,0])
+		for k in range(s['size'][2]):
+			if not mask[i,k]:
+				continue
+			s['cl'][:,k] += d['cloud_mask'][i,:,k]
+			if np.isfinite(d['cbh'][i,k]):
+				j = np.argmin(np.abs(s['zfull2'] - d['cbh'][i,k]))
+				s['cbh'][j,k] += 1
+			s['backscatter_avg'][:,k] += d['backscatter'][i,:,k]
+			if 'backscatter_mol' in d:
+				s['backscatter_mol_avg'][:,k] += d['backscatter_mol'][i,:]
+			s['n'][k] += 1
+			s['time_total'][k] += dt
+			s['clt'][k] += np.any(d['cloud_mask'][i,:,k])
+			for var in s['keep_vars']:
+				if not np.any(np.isnan(d[var][i])):
+					s[var+'_avg'][...,k] += stats.sel(d, var, i, None, k)
+					s[var+'_n'][k] += 1
+
+def hist_loop(d, s, var, ndim, mask, level=None):
+	if ndim == 1:
+		for k in range(s['size'][2]):
+			s[var+'_hist'][:,k] += np.histogram(
+				stats.sel(d, var, mask[:,k], level, k),
+				bins=s[var+'_half']
+			)[0]
+	else:
+		for j in range(s['size'][1]):
+			for k in range(s['size'][2]):
+				s[var+'_hist'][:,j,k] += np.histogram(
+					stats.sel(d, var, mask[:,k], j, k),
+					bins=s[var+'_half']
+				)[0]
+
+def map_hist_loop(d, s, mask):
+	hist_loop(d, s, 'backscatter', 2, mask)
+
+def map_hist(d, s, mask):
+	stats.hist(d, s, 'backscatter', 2, mask)
+
+def run(f, d, nfiles=2):
+	s = {}
+	stats.init(d, s, **OPTIONS)
+	mask = stats.create_mask(d, [], None, None, None, None, None)
+	t0 = time.perf_counter()
+	for _ in range(nfiles):
+		f(d, s, mask)
+	return s, time.perf_counter() - t0
+
+def main(n=2880, l=10):
+	d = dataset(n, l)
+	s1, t1 = run(map_profiles_loop, d)
+	s2, t2 = run(stats.map_profiles, d)
+	for var in ['cl', 'cbh', 'backscatter_avg', 'backscatter_mol_avg', 'n',
+		'time_total', 'clt', 'input_tas_avg', 'input_tas_n']:
+		if not np.allclose(s1[var], s2[var], rtol=1e-12, atol=0,
+			equal_nan=True):
+			raise AssertionError('%s differs' % var)
+	s3, t3 = run(map_hist_loop, d)
+	s4, t4 = run(map_hist, d)
+	if not np.array_equal(s3['backscatter_hist'], s4['backscatter_hist']):
+		raise AssertionError('backscatter_hist differs')
+	print('profiles: %d, columns: %d' % (n, l))
+	print('accumulation loop: %.3f s' % t1)
+	print('accumulation vectorised: %.3f s' % t2)
+	print('accumulation speed-up: %.1fx' % (t1/t2))
+	print('histogram loop: %.3f s' % t3)
+	print('histogram vectorised: %.3f s' % t4)
+	print('histogram speed-up: %.1fx' % (t3/t4))
+
+if __name__ == '__main__':
+	main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,38 @@
+'''Validation and benchmark of the solar altitude calculation.
+
+Compares misc.sun_altitude with the NOAA solar calculator algorithm with
+the astropy reference calculation at random times between 1950 and 2050
+and random locations, prints the maximum and mean absolute difference,
+the number of profiles classified differently as day or night, and the
+run times.
+
+Usage: python benchmarks/sun_altitude.py [<n>]
+'''
+
+import sys
+import time
+import numpy as np
+import aquarius_time as aq
+from alcf import misc
+
+def main(n=100000, seed=0):
+	rng = np.random.default_rng(seed)
+	t = rng.uniform(aq.from_iso('1950-01-01'), aq.from_iso('2050-01-01'), n)
+	lon = rng.uniform(0, 360, n)
+	lat = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+	t0 = time.perf_counter()
+	alt1 = misc.sun_altitude(t, lon, lat, method='astropy')
+	t1 = time.perf_counter()
+	alt2 = misc.sun_altitude(t, lon, lat, method='noaa')
+	t2 = time.perf_counter()
+	diff = np.abs(alt2 - alt1)
+	print('points: %d' % n)
+	print('max. abs. difference: %.4f deg' % np.max(diff))
+	print('mean abs. difference: %.4f deg' % np.mean(diff))
+	print('day/night differences: %d' % np.sum((alt1 >= 0) != (alt2 >= 0)))
+	print('astropy: %.3f s' % (t1 - t0))
+	print('noaa: %.3f s' % (t2 - t1))
+	print('speed-up: %.1fx' % ((t1 - t0)/(t2 - t1)))
+
+if __name__ == '__main__':
+	main(*[int(x) for x in sys.argv[1:]])